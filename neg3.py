@@ -3,7 +3,14 @@ import matplotlib.patches as patches
 import networkx as nx
 import numpy as np
 import random
+import math
 import heapq
+import bisect
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from abc import ABC, abstractmethod
 from collections import defaultdict, deque
 from itertools import combinations
 from dataclasses import dataclass
@@ -27,64 +34,75 @@ class Block:
                 f"size {self.width}x{self.height} with {len(self.rooms)} rooms")
 
 
+@dataclass
+class InfeasibilityReason:
+    """One reason a room/constraint set cannot be laid out on a floor"""
+    code: str  # 'total_area', 'room_does_not_fit', 'adjacency_degree', 'fixed_room_conflict' or
+    #            'conflicting_constraints'
+    message: str
+    rooms: List[str]
+
+
+@dataclass
+class FeasibilityReport:
+    """Result of FloorPlan.check_feasibility"""
+    feasible: bool
+    reasons: List[InfeasibilityReason]
+
+    def __str__(self):
+        if self.feasible:
+            return "Feasible"
+        return "\n".join(reason.message for reason in self.reasons)
+
+
 class BlockGenerator:
     """Handles all block generation algorithms"""
 
     def __init__(self, floor_plan):
         self.floor_plan = floor_plan
         self.grid = None
-        self.room_map = {}
+        self.room_table = [None]
+        self.labels = {}
         self.min_x = 0
         self.min_y = 0
         self.max_x = 0
         self.max_y = 0
 
     def create_grid(self):
-        """Create a grid representation of room types"""
-        if not self.floor_plan.rooms:
+        """Create the room-index raster of the floor plan (see FloorPlan._create_room_type_grid)"""
+        grid, table, min_x, min_y = self.floor_plan._create_room_type_grid()
+        if grid is None:
             return False
 
-        self.min_x = min(room.x for room in self.floor_plan.rooms)
-        self.max_x = max(room.x + room.width for room in self.floor_plan.rooms)
-        self.min_y = min(room.y for room in self.floor_plan.rooms)
-        self.max_y = max(room.y + room.height for room in self.floor_plan.rooms)
-
-        width = int(self.max_x - self.min_x)
-        height = int(self.max_y - self.min_y)
-        self.grid = [[None for _ in range(width)] for _ in range(height)]
-        self.room_map = {}
-
-        for room in self.floor_plan.rooms:
-            for x in range(int(room.x), int(room.x + room.width)):
-                for y in range(int(room.y), int(room.y + room.height)):
-                    grid_x = int(x - self.min_x)
-                    grid_y = int(y - self.min_y)
-                    if 0 <= grid_x < width and 0 <= grid_y < height:
-                        self.grid[grid_y][grid_x] = room.name
-                        self.room_map[(grid_x, grid_y)] = room
+        self.grid = grid
+        self.room_table = table
+        self.labels = {room.name: label for label, room in enumerate(table) if room is not None}
+        self.min_x, self.min_y = min_x, min_y
+        self.max_x, self.max_y = min_x + grid.shape[1], min_y + grid.shape[0]
         return True
 
     def find_contiguous_areas(self, room_type):
         """Flood fill to find connected areas of same room type"""
+        label = self.labels.get(room_type)
+        if label is None:
+            return []
         areas = []
         visited = set()
-        width = len(self.grid[0])
-        height = len(self.grid)
-
-        for y in range(height):
-            for x in range(width):
-                if self.grid[y][x] == room_type and (x, y) not in visited:
-                    area = []
-                    stack = [(x, y)]
-                    while stack:
-                        cx, cy = stack.pop()
-                        if 0 <= cx < width and 0 <= cy < height and \
-                                self.grid[cy][cx] == room_type and (cx, cy) not in visited:
-                            visited.add((cx, cy))
-                            area.append((cx, cy))
-                            stack.extend([(cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)])
-                    if area:
-                        areas.append(area)
+        height, width = self.grid.shape
+
+        for y, x in np.argwhere(self.grid == label).tolist():
+            if (x, y) not in visited:
+                area = []
+                stack = [(x, y)]
+                while stack:
+                    cx, cy = stack.pop()
+                    if 0 <= cx < width and 0 <= cy < height and \
+                            self.grid[cy, cx] == label and (cx, cy) not in visited:
+                        visited.add((cx, cy))
+                        area.append((cx, cy))
+                        stack.extend([(cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)])
+                if area:
+                    areas.append(area)
         return areas
 
     def find_maximal_rectangles(self, area, room_type):
@@ -100,10 +118,9 @@ class BlockGenerator:
 
         width = max_x - min_x + 1
         height = max_y - min_y + 1
-        grid = [[0] * width for _ in range(height)]
-
-        for x, y in area:
-            grid[y - min_y][x - min_x] = 1
+        grid = np.zeros((height, width), dtype=bool)
+        xs, ys = np.array(area).T
+        grid[ys - min_y, xs - min_x] = True
 
         # Find all maximal rectangles
         blocks = []
@@ -114,37 +131,19 @@ class BlockGenerator:
             best_rect = None
 
             # Find largest remaining rectangle
-            for y in range(height):
-                for x in range(width):
-                    if grid[y][x] == 1:
-                        # Expand right
-                        w = 0
-                        while x + w < width and grid[y][x + w] == 1:
-                            w += 1
-                        # Expand down
-                        h = 0
-                        while y + h < height and all(grid[y + h][x + i] == 1 for i in range(w)):
-                            h += 1
-
-                        size = w * h
-                        if size > max_size:
-                            max_size = size
-                            best_rect = (x, y, w, h)
+            for x, y, w, h in self.floor_plan._find_max_rectangles(grid, largest=1):
+                max_size = w * h
+                best_rect = (x, y, w, h)
 
             if not best_rect or max_size == 0:
                 break
 
             # Create block from rectangle
             bx, by, bw, bh = best_rect
-            rooms_in_block = []
-            for dy in range(bh):
-                for dx in range(bw):
-                    grid_x = min_x + bx + dx
-                    grid_y = min_y + by + dy
-                    if (grid_x, grid_y) in self.room_map:
-                        rooms_in_block.append(self.room_map[(grid_x, grid_y)])
-                    grid[by + dy][bx + dx] = 0
-                    covered.add((grid_x, grid_y))
+            grid[by:by + bh, bx:bx + bw] = False
+            covered.update((min_x + bx + dx, min_y + by + dy) for dy in range(bh) for dx in range(bw))
+            labels = np.unique(self.grid[min_y + by:min_y + by + bh, min_x + bx:min_x + bx + bw])
+            rooms_in_block = [self.room_table[label] for label in labels.tolist() if label]
 
             if rooms_in_block:
                 room_types = sorted(set(r.name for r in rooms_in_block))
@@ -158,7 +157,7 @@ class BlockGenerator:
                     y=real_y,
                     width=bw,
                     height=bh,
-                    rooms=list(set(rooms_in_block)),
+                    rooms=rooms_in_block,
                     room_types=set(room_types)
                 ))
 
@@ -212,6 +211,569 @@ class BlockGenerator:
         return blocks, residuals
 
 
+def summed_area_table(grid):
+    """Return the (h+1)x(w+1) summed-area table of a 2D array, zero-padded on the top/left"""
+    sat = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1), dtype=np.int64)
+    sat[1:, 1:] = grid.cumsum(axis=0).cumsum(axis=1)
+    return sat
+
+
+def rect_sum(sat, x0, y0, x1, y1):
+    """Sum of the cells in [x0, x1) x [y0, y1) using four reads of a summed-area table"""
+    return sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+
+
+class OccupancyRaster:
+    """
+    Per-cell room coverage counts over the floor bounding box.
+
+    Rectangle queries are answered from a summed-area table that is rebuilt lazily.
+    While the raster is changing faster than it is queried, queries fall back to
+    scanning the rows of the requested block instead, and the table is only rebuilt
+    once the scanned area since the last change exceeds the size of the raster.
+    """
+
+    def __init__(self, origin_x, origin_y, width, height):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.grid = np.zeros((height, width), dtype=np.int32)
+        self._sat = None
+        self._scanned_since_change = 0
+
+    def clear(self):
+        self.grid[:] = 0
+        self._sat = None
+        self._scanned_since_change = 0
+
+    def contains(self, x, y, width, height):
+        """Check if a rectangle lies inside the raster bounds"""
+        x0 = x - self.origin_x
+        y0 = y - self.origin_y
+        return x0 >= 0 and y0 >= 0 and x0 + width <= self.grid.shape[1] and y0 + height <= self.grid.shape[0]
+
+    def add(self, x, y, width, height, delta=1):
+        """Add delta to every cell of the rectangle (clipped to the raster)"""
+        x0 = max(x - self.origin_x, 0)
+        y0 = max(y - self.origin_y, 0)
+        x1 = min(x - self.origin_x + width, self.grid.shape[1])
+        y1 = min(y - self.origin_y + height, self.grid.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.grid[y0:y1, x0:x1] += delta
+        self._sat = None
+        self._scanned_since_change = 0
+
+    def remove(self, x, y, width, height):
+        self.add(x, y, width, height, delta=-1)
+
+    def count(self, x, y, width, height):
+        """Total coverage inside a rectangle that lies within the raster bounds"""
+        if width <= 0 or height <= 0:
+            return 0
+        x0 = x - self.origin_x
+        y0 = y - self.origin_y
+
+        if self._sat is None:
+            area = width * height
+            if self._scanned_since_change + area < self.grid.size:
+                # Blocked-row scan: cheaper than rebuilding the table for a few queries
+                self._scanned_since_change += area
+                return int(self.grid[y0:y0 + height, x0:x0 + width].sum())
+            self._sat = summed_area_table(self.grid)
+
+        return int(rect_sum(self._sat, x0, y0, x0 + width, y0 + height))
+
+
+def contact_matrices(rooms):
+    """
+    Return (shared_wall, overlap) boolean n x n matrices for a list of rooms.
+    shared_wall[i, j] matches rooms[i].has_shared_wall_with(rooms[j]); overlap[i, j]
+    is True when the two rooms' interiors intersect. Unplaced rooms never match.
+    """
+    n = len(rooms)
+    if n == 0:
+        empty = np.zeros((0, 0), dtype=bool)
+        return empty, empty.copy()
+
+    placed = np.array([room.x is not None and room.y is not None for room in rooms], dtype=bool)
+    coords = np.array([(room.x, room.y, room.width, room.height) if room.x is not None and room.y is not None
+                       else (0, 0, 0, 0) for room in rooms], dtype=float)
+
+    both_placed = placed[:, None] & placed[None, :]
+    np.fill_diagonal(both_placed, False)
+
+    shared_wall, overlap = rect_contacts(coords, coords)
+    return shared_wall & both_placed, overlap & both_placed
+
+
+def rect_contacts(rects_a, rects_b):
+    """
+    Broadcast (shared_wall, overlap) test between an m x 4 and an n x 4 array of
+    (x, y, width, height) rows. Returns two m x n boolean matrices.
+    """
+    rects_a = np.asarray(rects_a, dtype=float).reshape(-1, 4)
+    rects_b = np.asarray(rects_b, dtype=float).reshape(-1, 4)
+    left_a, bottom_a = rects_a[:, 0, None], rects_a[:, 1, None]
+    right_a, top_a = left_a + rects_a[:, 2, None], bottom_a + rects_a[:, 3, None]
+    left_b, bottom_b = rects_b[None, :, 0], rects_b[None, :, 1]
+    right_b, top_b = left_b + rects_b[None, :, 2], bottom_b + rects_b[None, :, 3]
+
+    # Positive-length overlap of the projections on each axis
+    x_overlap = np.maximum(left_a, left_b) < np.minimum(right_a, right_b)
+    y_overlap = np.maximum(bottom_a, bottom_b) < np.minimum(top_a, top_b)
+
+    vertical_wall = (right_a == left_b) | (left_a == right_b)
+    horizontal_wall = (top_a == bottom_b) | (bottom_a == top_b)
+
+    shared_wall = (vertical_wall & y_overlap) | (horizontal_wall & x_overlap)
+    return shared_wall, x_overlap & y_overlap
+
+
+def rects_share_wall(rect1, rect2):
+    """Rectangle version of Room.has_shared_wall_with for (x, y, width, height) tuples"""
+    x1, y1, w1, h1 = rect1
+    x2, y2, w2, h2 = rect2
+    if x1 + w1 == x2 or x2 + w2 == x1:
+        return max(y1, y2) < min(y1 + h1, y2 + h2)
+    if y1 + h1 == y2 or y2 + h2 == y1:
+        return max(x1, x2) < min(x1 + w1, x2 + w2)
+    return False
+
+
+def intersection_area(rect1, rect2):
+    """Overlap area of two (x, y, width, height) rectangles"""
+    x1, y1, w1, h1 = rect1
+    x2, y2, w2, h2 = rect2
+    dx = min(x1 + w1, x2 + w2) - max(x1, x2)
+    dy = min(y1 + h1, y2 + h2) - max(y1, y2)
+    if dx <= 0 or dy <= 0:
+        return 0
+    return dx * dy
+
+
+class SpatialIndex(ABC):
+    """
+    Interface for the room index used by FloorPlan.
+
+    Rectangles are (x, y, width, height). query_rect returns rooms whose interior
+    overlaps the rectangle; query_neighbors also returns rooms that only touch it
+    along an edge or corner, which is what wall-sharing checks need.
+    """
+
+    def configure(self, rooms):
+        """Tune the index for a set of rooms before they are inserted (optional)"""
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def insert(self, room, rect):
+        pass
+
+    @abstractmethod
+    def remove(self, room):
+        pass
+
+    @abstractmethod
+    def query_rect(self, x, y, width, height):
+        pass
+
+    @abstractmethod
+    def query_neighbors(self, x, y, width, height):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+def _rects_overlap(rect, x, y, width, height):
+    rx, ry, rw, rh = rect
+    return x < rx + rw and rx < x + width and y < ry + rh and ry < y + height
+
+
+def _rects_touch(rect, x, y, width, height):
+    rx, ry, rw, rh = rect
+    return x <= rx + rw and rx <= x + width and y <= ry + rh and ry <= y + height
+
+
+class UniformGridIndex(SpatialIndex):
+    """
+    Hash grid of fixed-size cells. When cell_size is not given it is derived from the
+    room size distribution (median room side), so a typical room touches ~4 cells.
+    Buckets are sets, so removal is O(1) per cell.
+    """
+
+    def __init__(self, cell_size=None):
+        self.fixed_cell_size = cell_size
+        self.cell_size = cell_size or 2
+        self.cells = defaultdict(set)
+        self.rects = {}
+
+    def configure(self, rooms):
+        if self.fixed_cell_size or not rooms:
+            return
+        sides = sorted(max(room.width, room.height) for room in rooms)
+        cell_size = max(1, int(sides[len(sides) // 2]))
+        if cell_size != self.cell_size:
+            self.cell_size = cell_size
+            # Re-bucket anything already indexed
+            rects = self.rects
+            self.clear()
+            for room, rect in rects.items():
+                self.insert(room, rect)
+
+    def clear(self):
+        self.cells = defaultdict(set)
+        self.rects = {}
+
+    def _cell_range(self, x, y, width, height, pad=0):
+        size = self.cell_size
+        return (range(int((x - pad) // size), int((x + max(width, 1) - 1 + pad) // size) + 1),
+                range(int((y - pad) // size), int((y + max(height, 1) - 1 + pad) // size) + 1))
+
+    def insert(self, room, rect):
+        if room in self.rects:
+            self.remove(room)
+        self.rects[room] = rect
+        xs, ys = self._cell_range(*rect)
+        for gx in xs:
+            for gy in ys:
+                self.cells[(gx, gy)].add(room)
+
+    def remove(self, room):
+        rect = self.rects.pop(room, None)
+        if rect is None:
+            return
+        xs, ys = self._cell_range(*rect)
+        for gx in xs:
+            for gy in ys:
+                bucket = self.cells.get((gx, gy))
+                if bucket is not None:
+                    bucket.discard(room)
+                    if not bucket:
+                        del self.cells[(gx, gy)]
+
+    def _candidates(self, x, y, width, height, pad):
+        found = set()
+        xs, ys = self._cell_range(x, y, width, height, pad)
+        for gx in xs:
+            for gy in ys:
+                bucket = self.cells.get((gx, gy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def query_rect(self, x, y, width, height):
+        return [room for room in self._candidates(x, y, width, height, 0)
+                if _rects_overlap(self.rects[room], x, y, width, height)]
+
+    def query_neighbors(self, x, y, width, height):
+        # Pad by one unit so rooms that only touch an edge land in the scanned cells
+        return [room for room in self._candidates(x, y, width, height, 1)
+                if _rects_touch(self.rects[room], x, y, width, height)]
+
+    def __len__(self):
+        return len(self.rects)
+
+
+class QuadTreeIndex(SpatialIndex):
+    """
+    Region quadtree over the floor bounds. A room is stored in the deepest node that
+    fully contains it, so large rooms stay near the root and small ones sink.
+    """
+
+    class _Node:
+        __slots__ = ('x', 'y', 'width', 'height', 'depth', 'items', 'children')
+
+        def __init__(self, x, y, width, height, depth):
+            self.x = x
+            self.y = y
+            self.width = width
+            self.height = height
+            self.depth = depth
+            self.items = {}
+            self.children = None
+
+    def __init__(self, bounds=(0, 0, 64, 64), max_items=8, max_depth=8):
+        self.bounds = bounds
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.clear()
+
+    def clear(self):
+        self.root = self._Node(*self.bounds, 0)
+        self.nodes = {}  # room -> node holding it
+
+    def _child_for(self, node, rect):
+        """Return the child of node that fully contains rect, or None if it straddles"""
+        x, y, width, height = rect
+        for child in node.children:
+            if (x >= child.x and y >= child.y and
+                    x + width <= child.x + child.width and y + height <= child.y + child.height):
+                return child
+        return None
+
+    def _split(self, node):
+        half_w = node.width / 2
+        half_h = node.height / 2
+        node.children = [
+            self._Node(node.x, node.y, half_w, half_h, node.depth + 1),
+            self._Node(node.x + half_w, node.y, half_w, half_h, node.depth + 1),
+            self._Node(node.x, node.y + half_h, half_w, half_h, node.depth + 1),
+            self._Node(node.x + half_w, node.y + half_h, half_w, half_h, node.depth + 1),
+        ]
+        items = node.items
+        node.items = {}
+        for room, rect in items.items():
+            self._insert_at(node, room, rect)
+
+    def _insert_at(self, node, room, rect):
+        while node.children is not None:
+            child = self._child_for(node, rect)
+            if child is None:
+                break
+            node = child
+        node.items[room] = rect
+        self.nodes[room] = node
+        if (node.children is None and len(node.items) > self.max_items and
+                node.depth < self.max_depth and min(node.width, node.height) > 1):
+            self._split(node)
+
+    def insert(self, room, rect):
+        if room in self.nodes:
+            self.remove(room)
+        self._insert_at(self.root, room, rect)
+
+    def remove(self, room):
+        node = self.nodes.pop(room, None)
+        if node is not None:
+            node.items.pop(room, None)
+
+    def _query(self, x, y, width, height, test):
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for room, rect in node.items.items():
+                if test(rect, x, y, width, height):
+                    found.append(room)
+            if node.children is not None:
+                for child in node.children:
+                    # Closed test so children that only touch the query are still visited
+                    if _rects_touch((child.x, child.y, child.width, child.height), x, y, width, height):
+                        stack.append(child)
+        return found
+
+    def query_rect(self, x, y, width, height):
+        return self._query(x, y, width, height, _rects_overlap)
+
+    def query_neighbors(self, x, y, width, height):
+        return self._query(x, y, width, height, _rects_touch)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class IntervalIndex(SpatialIndex):
+    """
+    Rooms kept sorted by left edge. A query bisects to the rooms whose left edge is at
+    most the query's right edge and scans back only as far as the widest room allows.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.keys = []  # sorted (left, insertion order)
+        self.entries = []  # (room, rect), parallel to keys
+        self.rects = {}
+        self.key_of = {}
+        self.max_width = 0
+        self._counter = 0
+
+    def insert(self, room, rect):
+        if room in self.rects:
+            self.remove(room)
+        key = (rect[0], self._counter)
+        self._counter += 1
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.entries.insert(i, (room, rect))
+        self.rects[room] = rect
+        self.key_of[room] = key
+        self.max_width = max(self.max_width, rect[2])
+
+    def remove(self, room):
+        if self.rects.pop(room, None) is None:
+            return
+        key = self.key_of.pop(room)
+        i = bisect.bisect_left(self.keys, key)
+        del self.keys[i]
+        del self.entries[i]
+        if not self.rects:
+            self.max_width = 0
+
+    def _query(self, x, y, width, height, test, touching):
+        # Only rooms whose left edge lies in [x - max_width, x + width] can intersect
+        lo = bisect.bisect_left(self.keys, (x - self.max_width, -1))
+        if touching:
+            hi = bisect.bisect_right(self.keys, (x + width, self._counter))
+        else:
+            hi = bisect.bisect_left(self.keys, (x + width, -1))
+        return [room for room, rect in self.entries[lo:hi] if test(rect, x, y, width, height)]
+
+    def query_rect(self, x, y, width, height):
+        return self._query(x, y, width, height, _rects_overlap, False)
+
+    def query_neighbors(self, x, y, width, height):
+        return self._query(x, y, width, height, _rects_touch, True)
+
+    def __len__(self):
+        return len(self.rects)
+
+
+SPATIAL_INDEX_BACKENDS = {
+    'grid': UniformGridIndex,
+    'quadtree': QuadTreeIndex,
+    'interval': IntervalIndex,
+}
+
+
+class WallContactIndex:
+    """
+    Room edges keyed by wall coordinate.
+
+    Vertical edges live in left/right maps keyed by x and horizontal edges in
+    bottom/top maps keyed by y. Each key holds a list of (start, end, seq, room)
+    spans sorted by start, so the rooms across one wall of a room are found with a
+    bisect plus a scan of the k matches.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.left = defaultdict(list)
+        self.right = defaultdict(list)
+        self.bottom = defaultdict(list)
+        self.top = defaultdict(list)
+        self.max_span = defaultdict(int)  # (id(edge map), coord) -> longest span ever stored there
+        self.rects = {}
+        self._seq = 0
+
+    def _edges(self, rect):
+        x, y, width, height = rect
+        return ((self.left, x, y, y + height),
+                (self.right, x + width, y, y + height),
+                (self.bottom, y, x, x + width),
+                (self.top, y + height, x, x + width))
+
+    def insert(self, room, rect):
+        if room in self.rects:
+            self.remove(room)
+        self.rects[room] = rect
+        seq = self._seq
+        self._seq += 1
+        for edge_map, coord, start, end in self._edges(rect):
+            bisect.insort(edge_map[coord], (start, end, seq, room))
+            span_key = (id(edge_map), coord)
+            self.max_span[span_key] = max(self.max_span[span_key], end - start)
+
+    def remove(self, room):
+        rect = self.rects.pop(room, None)
+        if rect is None:
+            return
+        for edge_map, coord, start, end in self._edges(rect):
+            spans = edge_map[coord]
+            i = bisect.bisect_left(spans, (start, end))
+            while spans[i][3] is not room:
+                i += 1
+            del spans[i]
+            if not spans:
+                del edge_map[coord]
+                self.max_span.pop((id(edge_map), coord), None)
+
+    def update(self, room, rect):
+        self.insert(room, rect)
+
+    def _spans_overlapping(self, edge_map, coord, start, end):
+        """Rooms whose span on this wall overlaps (start, end) with positive length"""
+        spans = edge_map.get(coord)
+        if not spans:
+            return []
+        found = []
+        i = bisect.bisect_left(spans, (start - self.max_span[(id(edge_map), coord)],))
+        while i < len(spans) and spans[i][0] < end:
+            if spans[i][1] > start:
+                found.append(spans[i][3])
+            i += 1
+        return found
+
+    def rooms_sharing_wall(self, x, y, width, height, exclude=None):
+        """All indexed rooms that would share a wall with the given rectangle"""
+        found = (self._spans_overlapping(self.left, x + width, y, y + height) +
+                 self._spans_overlapping(self.right, x, y, y + height) +
+                 self._spans_overlapping(self.bottom, y + height, x, x + width) +
+                 self._spans_overlapping(self.top, y, x, x + width))
+        return [room for room in found if room is not exclude]
+
+    def neighbors(self, room):
+        """Rooms sharing a wall with an indexed room"""
+        rect = self.rects.get(room)
+        if rect is None:
+            return []
+        return self.rooms_sharing_wall(*rect, exclude=room)
+
+    @staticmethod
+    def _sweep(first, second, graph):
+        """Add an edge for every pair of spans from two sorted lists that overlap"""
+        i = j = 0
+        while i < len(first) and j < len(second):
+            a_start, a_end, _, a_room = first[i]
+            b_start, b_end, _, b_room = second[j]
+            if a_start < b_end and b_start < a_end and a_room is not b_room:
+                graph.add_edge(a_room.name, b_room.name)
+            # Advance whichever span finishes first
+            if a_end <= b_end:
+                i += 1
+            else:
+                j += 1
+
+    def contact_graph(self):
+        """Graph of room names with an edge for every shared wall, built in one sweep"""
+        graph = nx.Graph()
+        graph.add_nodes_from(room.name for room in self.rects)
+        for coord, spans in self.right.items():
+            if coord in self.left:
+                self._sweep(spans, self.left[coord], graph)
+        for coord, spans in self.top.items():
+            if coord in self.bottom:
+                self._sweep(spans, self.bottom[coord], graph)
+        return graph
+
+    def __len__(self):
+        return len(self.rects)
+
+
+class CancellationToken:
+    """Cooperative cancellation flag shared between a caller and a running layout search"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
 class Room:
     def __init__(self, name, width, height, max_expansion=20):
         self.name = name
@@ -225,6 +787,7 @@ class Room:
         # Add max_expansion parameter to control how much a room can expand
         self.max_expansion = max_expansion
         self.block_id = None  # NEW: Track block assignment
+        self.fixed = False  # Fixed rooms keep their position (see FloorPlan.fix_room)
 
     def rotate(self):
         self.width, self.height = self.height, self.width
@@ -291,46 +854,70 @@ class Room:
 
 
 class FloorPlan:
-    def compact_rooms(self):
-        def overlaps(r1, r2):
-            return not (
-                    r1.x + r1.width <= r2.x or
-                    r2.x + r2.width <= r1.x or
-                    r1.y + r1.height <= r2.y or
-                    r2.y + r2.height <= r1.y
-            )
-
-        def is_within_any_floor_region(room):
-            """Check if the entire room lies inside any one allowed region."""
-            for region in self.floor_regions:
-                rx, ry, rw, rh = region['x'], region['y'], region['width'], region['height']
-                if (room.x >= rx and
-                        room.y >= ry and
-                        room.x + room.width <= rx + rw and
-                        room.y + room.height <= ry + rh):
-                    return True
-            return False
+    def compact_rooms(self, gravity='both'):
+        """
+        Slide rooms towards the origin without overlaps or leaving the floor.
+
+        gravity: 'left', 'down' or 'both' (alternate left and down sweeps until
+        nothing moves). A sweep visits rooms in order of the edge facing the gravity
+        direction, so every obstacle a room can hit has already settled, and moves
+        each room in one step by its exact free distance on the occupancy raster,
+        stopping short where it would share a wall with a room it must not be
+        adjacent to. Fixed rooms stay where they are.
+        """
+        if gravity not in ('left', 'down', 'both'):
+            raise ValueError(f"Unknown gravity '{gravity}'")
+        directions = ['left', 'down'] if gravity == 'both' else [gravity]
+        if not self._index_is_current():
+            self.rebuild_spatial_index()
 
         moved = True
         while moved:
             moved = False
-            for room in sorted(self.rooms, key=lambda r: (r.x, r.y)):
-                while room.x > 0:
-                    room.x -= 1
-                    if not is_within_any_floor_region(room) or any(
-                            overlaps(room, other) for other in self.rooms if other != room):
-                        room.x += 1
-                        break
-                    moved = True
-                while room.y > 0:
-                    room.y -= 1
-                    if not is_within_any_floor_region(room) or any(
-                            overlaps(room, other) for other in self.rooms if other != room):
-                        room.y += 1
-                        break
+            for direction in directions:
+                if self._compaction_sweep(direction):
                     moved = True
+            if len(directions) == 1:
+                break
 
-    def __init__(self, region_specs):
+    def _compaction_sweep(self, direction):
+        """One gravity sweep of compact_rooms. Returns True if any room moved."""
+        rooms = [room for room in self.rooms if room.x is not None and room.y is not None and not room.fixed]
+        if direction == 'left':
+            rooms.sort(key=lambda room: (room.x, room.y))
+        else:
+            rooms.sort(key=lambda room: (room.y, room.x))
+
+        moved = False
+        for room in rooms:
+            distance = self._free_distance(room.x, room.y, room.width, room.height, direction)
+            # Stop short of rooms it must not touch
+            while distance and self.check_non_adjacency_violation(
+                    room, room.x - distance if direction == 'left' else room.x,
+                    room.y - distance if direction == 'down' else room.y, room.width, room.height):
+                distance -= 1
+            if distance:
+                if direction == 'left':
+                    self.move_room(room, room.x - distance, room.y)
+                else:
+                    self.move_room(room, room.x, room.y - distance)
+                moved = True
+        return moved
+
+    # Weights of the best-fit candidate score (see rank_candidates). Adjacency and
+    # non-adjacency follow evaluate_adjacency_score. Touching unrelated rooms uses up
+    # walls later partners need, which outweighs what hugging them buys, so contact
+    # is off by default; raise it to favour tighter packing over the adjacency score.
+    candidate_weights = {'adjacency': 1.0, 'non_adjacency': 2.0, 'unrelated': 0.3,
+                         'contact': 0.0, 'fragment': 0.5}
+
+    # Side of the tiles _contact_counts groups candidates into, in multiples of the
+    # candidate size: one spatial_index query per tile. Up to its square, candidates
+    # are looked up one by one instead.
+    contact_tile_size = 16
+
+    def __init__(self, region_specs, spatial_index='grid', candidate_strategy='random',
+                 candidate_ranking='best', expansion_mode='sequential'):
         """
         region_specs: list of dictionaries with the following keys:
         - 'width': width of the rectangular region
@@ -343,11 +930,23 @@ class FloorPlan:
             {'x': 0, 'y': 4, 'width': 18, 'height': 6},
             {'x': 0, 'y': 10, 'width': 22, 'height': 6}
         ]
+
+        spatial_index: name of the room index backend ('grid', 'quadtree' or 'interval',
+        see SPATIAL_INDEX_BACKENDS) or a SpatialIndex instance
+        candidate_strategy: how get_valid_positions proposes positions, 'random' (flush
+        against adjacency partners, then random sampling) or 'corners' (ranked corner points)
+        candidate_ranking: how the placement loop picks among those positions, 'best'
+        (highest rank_candidates score) or 'first' (first valid position)
+        expansion_mode: how expand_rooms_optimized grows rooms, 'sequential' (one room
+        at a time, each as far as it can) or 'wavefront' (all rooms together, one
+        ring at a time, see expand_rooms_wavefront)
         """
         self.rooms = []
+        self._rooms_by_name = {}
         self.adjacency_graph = nx.Graph()
         self.non_adjacency_graph = nx.Graph()
         self.floor_regions = []
+        self.feasibility_report = None  # Set by generate_layout
         self.blocks = []  # Track all generated blocks
         self.current_block_iteration = 0
         self.block_generation_complete = False
@@ -374,76 +973,448 @@ class FloorPlan:
                     'height': region['height']
                 })
 
-        # Calculate floor dimensions
+        # Calculate floor dimensions and rasterize the regions once so that
+        # rectangle containment is a summed-area lookup
+        self._rasterize_floor()
+
+        # Add spatial indexing for faster overlap detection
+        self.spatial_index = self._create_spatial_index(spatial_index)
+        self.wall_index = WallContactIndex()
+        self.occupancy = OccupancyRaster(self.floor_origin_x, self.floor_origin_y,
+                                         self.floor_width - self.floor_origin_x,
+                                         self.floor_height - self.floor_origin_y)
+        self._indexed_rects = {}  # room -> (x, y, width, height) it was indexed with
+        # Running score: constraint edges (as frozensets of names) between indexed rooms
+        self._satisfied_adjacencies = set()
+        self._violated_non_adjacencies = set()
+        if candidate_strategy not in ('random', 'corners'):
+            raise ValueError(f"Unknown candidate strategy '{candidate_strategy}'")
+        self.candidate_strategy = candidate_strategy
+        self._corner_points = self._region_corner_points()
+        if candidate_ranking not in ('best', 'first'):
+            raise ValueError(f"Unknown candidate ranking '{candidate_ranking}'")
+        self.candidate_ranking = candidate_ranking
+        if expansion_mode not in ('sequential', 'wavefront'):
+            raise ValueError(f"Unknown expansion mode '{expansion_mode}'")
+        self.expansion_mode = expansion_mode
+        # Rooms the restart search keeps where they are (see relayout)
+        self._pinned = set()
+
+    def rebuild_floor_mask(self):
+        """
+        Rasterize floor_regions into an occupancy array plus its summed-area table.
+        floor_regions stays the source of truth: call this again after editing it.
+        The occupancy raster and spatial index are resized to the new floor bounds
+        and every placed room is re-indexed.
+        """
+        self._rasterize_floor()
+        self.occupancy = OccupancyRaster(self.floor_origin_x, self.floor_origin_y,
+                                         self.floor_width - self.floor_origin_x,
+                                         self.floor_height - self.floor_origin_y)
+        if isinstance(self.spatial_index, QuadTreeIndex):
+            self.spatial_index.bounds = (self.floor_origin_x, self.floor_origin_y,
+                                         self.floor_width - self.floor_origin_x,
+                                         self.floor_height - self.floor_origin_y)
+        self.rebuild_spatial_index()
+
+    def _rasterize_floor(self):
+        """Compute the floor bounds, floor_mask and its summed-area table from floor_regions"""
+        self.floor_origin_x = min(region['x'] for region in self.floor_regions)
+        self.floor_origin_y = min(region['y'] for region in self.floor_regions)
         self.floor_width = max(region['x'] + region['width'] for region in self.floor_regions)
         self.floor_height = max(region['y'] + region['height'] for region in self.floor_regions)
 
-        # Add spatial indexing for faster overlap detection
-        self.spatial_grid = {}
-        self.grid_size = 2  # Grid cell size for spatial indexing
-
-    def _get_grid_cells(self, x, y, width, height):
-        """Get all grid cells that a rectangle occupies"""
-        cells = []
-        start_x = x // self.grid_size
-        end_x = (x + width - 1) // self.grid_size
-        start_y = y // self.grid_size
-        end_y = (y + height - 1) // self.grid_size
-
-        for gx in range(start_x, end_x + 1):
-            for gy in range(start_y, end_y + 1):
-                cells.append((gx, gy))
-        return cells
-
-    def _add_to_spatial_grid(self, room):
-        """Add room to spatial grid for fast overlap detection"""
-        if room.x is None or room.y is None:
-            return
+        mask = np.zeros((self.floor_height - self.floor_origin_y, self.floor_width - self.floor_origin_x),
+                        dtype=np.int32)
+        for region in self.floor_regions:
+            x0 = region['x'] - self.floor_origin_x
+            y0 = region['y'] - self.floor_origin_y
+            mask[y0:y0 + region['height'], x0:x0 + region['width']] = 1
+
+        self.floor_mask = mask
+        self.floor_mask_sat = summed_area_table(mask)
+
+    def _create_spatial_index(self, spec):
+        """Build the room index selected by name, or accept a ready-made SpatialIndex"""
+        if isinstance(spec, SpatialIndex):
+            return spec
+        if spec not in SPATIAL_INDEX_BACKENDS:
+            raise ValueError(f"Unknown spatial index '{spec}', expected one of {sorted(SPATIAL_INDEX_BACKENDS)}")
+        if spec == 'quadtree':
+            return QuadTreeIndex(bounds=(self.floor_origin_x, self.floor_origin_y,
+                                         self.floor_width - self.floor_origin_x,
+                                         self.floor_height - self.floor_origin_y))
+        return SPATIAL_INDEX_BACKENDS[spec]()
+
+    def _reset_spatial_index(self):
+        """Forget every indexed room"""
+        self.spatial_index.clear()
+        self.spatial_index.configure(self.rooms)
+        self.wall_index.clear()
+        self.occupancy.clear()
+        self._indexed_rects = {}
+        self._satisfied_adjacencies = set()
+        self._violated_non_adjacencies = set()
+        self._corner_points = self._region_corner_points()
+        # Fixed rooms are part of the empty floor as far as placement is concerned
+        for room in self.rooms:
+            if room.fixed:
+                self._add_to_spatial_index(room)
 
-        cells = self._get_grid_cells(room.x, room.y, room.width, room.height)
-        for cell in cells:
-            if cell not in self.spatial_grid:
-                self.spatial_grid[cell] = []
-            self.spatial_grid[cell].append(room)
+    def _clear_placements(self):
+        """Unplace every room that is not fixed and reset the index to the fixed rooms"""
+        for room in self.rooms:
+            if not room.fixed:
+                room.x = None
+                room.y = None
+                room.reset_to_original_size()
+        self._reset_spatial_index()
 
-    def _remove_from_spatial_grid(self, room):
-        """Remove room from spatial grid"""
+    def rebuild_spatial_index(self):
+        """Re-index every placed room, e.g. after room positions were edited directly"""
+        self._reset_spatial_index()
+        for room in self.rooms:
+            self._add_to_spatial_index(room)
+
+    def _add_to_spatial_index(self, room):
+        """Add room to the spatial index and occupancy raster for fast overlap detection"""
         if room.x is None or room.y is None:
             return
+        if room in self._indexed_rects:
+            self._remove_from_spatial_index(room)
+
+        rect = (room.x, room.y, room.width, room.height)
+        self._indexed_rects[room] = rect
+        self.occupancy.add(*rect)
+        self.spatial_index.insert(room, rect)
+        self.wall_index.insert(room, rect)
+        self._track_constraints(room)
+
+        x, y, width, height = rect
+        self._corner_points.update(((x, y), (x + width, y), (x, y + height), (x + width, y + height)))
+
+    def _remove_from_spatial_index(self, room):
+        """Remove room from the spatial index and occupancy raster"""
+        # Use the rectangle the room was indexed with, in case it has moved since
+        rect = self._indexed_rects.pop(room, None)
+        if rect is None:
+            return
+        self.occupancy.remove(*rect)
+        self.spatial_index.remove(room)
+        self.wall_index.remove(room)
+        self._untrack_constraints(room)
+
+    def _track_constraint_edge(self, name1, name2):
+        """Re-evaluate one constraint edge against the indexed rectangles"""
+        key = frozenset((name1, name2))
+        room1 = self.get_room(name1)
+        room2 = self.get_room(name2)
+        rect1 = self._indexed_rects.get(room1)
+        rect2 = self._indexed_rects.get(room2)
+        touching = rect1 is not None and rect2 is not None and rects_share_wall(rect1, rect2)
+
+        if self.adjacency_graph.has_edge(name1, name2):
+            if touching:
+                self._satisfied_adjacencies.add(key)
+            else:
+                self._satisfied_adjacencies.discard(key)
+        if self.non_adjacency_graph.has_edge(name1, name2):
+            if touching:
+                self._violated_non_adjacencies.add(key)
+            else:
+                self._violated_non_adjacencies.discard(key)
+
+    def _track_constraints(self, room):
+        """Update the running score for the constraint edges incident to a newly indexed room"""
+        for graph in (self.adjacency_graph, self.non_adjacency_graph):
+            if room.name in graph:
+                for neighbor in graph.neighbors(room.name):
+                    self._track_constraint_edge(room.name, neighbor)
+
+    def _untrack_constraints(self, room):
+        """Drop the constraint edges incident to a room that left the index"""
+        for graph, tracked in ((self.adjacency_graph, self._satisfied_adjacencies),
+                               (self.non_adjacency_graph, self._violated_non_adjacencies)):
+            if room.name in graph:
+                for neighbor in graph.neighbors(room.name):
+                    tracked.discard(frozenset((room.name, neighbor)))
+
+    def _index_is_current(self):
+        """Check that every placed room is indexed at its current rectangle and nothing else is"""
+        indexed = 0
+        for room in self.rooms:
+            rect = self._indexed_rects.get(room)
+            if room.x is None or room.y is None:
+                if rect is not None:
+                    return False
+                continue
+            if rect != (room.x, room.y, room.width, room.height):
+                return False
+            indexed += 1
+        return indexed == len(self._indexed_rects)
 
-        cells = self._get_grid_cells(room.x, room.y, room.width, room.height)
-        for cell in cells:
-            if cell in self.spatial_grid and room in self.spatial_grid[cell]:
-                self.spatial_grid[cell].remove(room)
-                if not self.spatial_grid[cell]:
-                    del self.spatial_grid[cell]
+    def move_room(self, room, x, y, width=None, height=None):
+        """
+        Move and/or resize a room, updating the indexes and the running adjacency score
+        for only the edges incident to that room. Pass x=None to unplace it.
+        """
+        self._remove_from_spatial_index(room)
+        room.x = x
+        room.y = y
+        if width is not None:
+            room.width = width
+        if height is not None:
+            room.height = height
+        self._add_to_spatial_index(room)
 
     def check_overlap_optimized(self, room, x, y, width, height):
-        """Optimized overlap detection using spatial grid"""
-        cells = self._get_grid_cells(x, y, width, height)
-        checked_rooms = set()
-
-        for cell in cells:
-            if cell in self.spatial_grid:
-                for existing_room in self.spatial_grid[cell]:
-                    if existing_room != room and existing_room not in checked_rooms:
-                        checked_rooms.add(existing_room)
-                        # Check actual overlap
-                        if (x < existing_room.x + existing_room.width and
-                                x + width > existing_room.x and
-                                y < existing_room.y + existing_room.height and
-                                y + height > existing_room.y):
-                            return True
-        return False
+        """Optimized overlap detection using the occupancy raster"""
+        if self.occupancy.contains(x, y, width, height):
+            covered = self.occupancy.count(x, y, width, height)
+            own_rect = self._indexed_rects.get(room)
+            if own_rect is not None:
+                covered -= intersection_area(own_rect, (x, y, width, height))
+            return covered > 0
+
+        # Rectangles poking outside the floor fall back to the spatial index
+        return any(existing_room is not room for existing_room in self.spatial_index.query_rect(x, y, width, height))
+
+    def _has_any_shared_wall(self, room):
+        """Check if a placed room shares a wall with any other indexed room"""
+        return bool(self.wall_index.rooms_sharing_wall(room.x, room.y, room.width, room.height, exclude=room))
+
+    def get_room(self, name):
+        """Look up a room by name"""
+        return self._rooms_by_name.get(name)
+
+    def shared_wall_neighbors(self, room):
+        """Rooms currently sharing a wall with the given placed room"""
+        if room.x is None or room.y is None:
+            return []
+        return self.wall_index.rooms_sharing_wall(room.x, room.y, room.width, room.height, exclude=room)
+
+    def contact_graph(self):
+        """Graph of room names with an edge for every pair of rooms sharing a wall"""
+        return self.wall_index.contact_graph()
+
+    def _region_corner_points(self):
+        """Corner points of every floor region, the seed of the corner set"""
+        points = set()
+        for region in self.floor_regions:
+            x, y, width, height = region['x'], region['y'], region['width'], region['height']
+            points.update(((x, y), (x + width, y), (x, y + height), (x + width, y + height)))
+        return points
+
+    def _free_cells(self, room=None):
+        """Boolean raster of floor cells not covered by any indexed room other than room"""
+        occupied = self.occupancy.grid.copy()
+        own_rect = self._indexed_rects.get(room) if room is not None else None
+        if own_rect is not None:
+            x, y, width, height = own_rect
+            x0, y0 = max(x - self.floor_origin_x, 0), max(y - self.floor_origin_y, 0)
+            occupied[y0:y - self.floor_origin_y + height, x0:x - self.floor_origin_x + width] -= 1
+        return (self.floor_mask > 0) & (occupied == 0)
+
+    def _contact_counts(self, room, rects):
+        """
+        For every candidate rectangle (rows of x, y, width, height), count the indexed
+        rooms other than room it would share a wall with: adjacency partners,
+        non-adjacent rooms and all of them. Returns three integer arrays.
+
+        Only rooms spatial_index.query_neighbors reports around the candidates are
+        compared: around each candidate when there are few, else around square tiles
+        the candidates are grouped into.
+        """
+        rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        gain = np.zeros(len(rects), dtype=np.int64)
+        penalty = np.zeros(len(rects), dtype=np.int64)
+        total = np.zeros(len(rects), dtype=np.int64)
+        if len(rects) == 0 or not self._indexed_rects:
+            return gain, penalty, total
+        partners = set(self.adjacency_graph[room.name]) if room.name in self.adjacency_graph else set()
+        forbidden = set(self.non_adjacency_graph[room.name]) if room.name in self.non_adjacency_graph else set()
+
+        if len(rects) <= self.contact_tile_size ** 2:
+            # Few candidates: one comparison against everything around any of them
+            near = set()
+            for x, y, width, height in rects.tolist():
+                near.update(self.spatial_index.query_neighbors(x, y, width, height))
+            tiles = [(np.arange(len(rects)), near)]
+        else:
+            tile = self.contact_tile_size * max(int(rects[:, 2:].max()), 1)
+            _, groups = np.unique(rects[:, :2] // tile, axis=0, return_inverse=True)
+            groups = groups.ravel()
+            order = np.argsort(groups, kind='stable')
+            tiles = []
+            for members in np.split(order, np.flatnonzero(np.diff(groups[order])) + 1):
+                x0, y0 = rects[members, :2].min(axis=0).tolist()
+                x1, y1 = (rects[members, :2] + rects[members, 2:]).max(axis=0).tolist()
+                tiles.append((members, self.spatial_index.query_neighbors(x0, y0, x1 - x0, y1 - y0)))
+
+        for members, near in tiles:
+            others = [other for other in near if other is not room]
+            if not others:
+                continue
+            group = rects[members]
+            touching, _ = rect_contacts(group, [self._indexed_rects[other] for other in others])
+            gain[members] = touching[:, [other.name in partners for other in others]].sum(axis=1)
+            penalty[members] = touching[:, [other.name in forbidden for other in others]].sum(axis=1)
+            total[members] = touching.sum(axis=1)
+        return gain, penalty, total
+
+    def get_corner_positions(self, room, max_positions=100):
+        """
+        Deterministic candidate generator: try the room with each of its corners on a
+        point of the corner set (corners of placed rooms and of the floor regions),
+        keep the legal positions and rank them by adjacency gain.
+
+        The whole pass is vectorized over the corner set. Corner points whose four
+        surrounding cells are all occupied or off the floor can never anchor a room
+        again and are dropped from the set as they are found.
+        """
+        if not self._corner_points:
+            return []
+        width, height = room.width, room.height
+        free = self._free_cells(room)
+        mask_height, mask_width = free.shape
+
+        # Pad with a blocked border so the four cells around every corner can be read directly
+        padded = np.zeros((mask_height + 2, mask_width + 2), dtype=bool)
+        padded[1:-1, 1:-1] = free
+        points = np.array(list(self._corner_points), dtype=np.int64)
+        px = np.clip(points[:, 0] - self.floor_origin_x, -1, mask_width) + 1
+        py = np.clip(points[:, 1] - self.floor_origin_y, -1, mask_height) + 1
+        quadrants = np.stack([padded[py - 1, px - 1], padded[py - 1, px], padded[py, px - 1], padded[py, px]], axis=1)
+
+        dead = ~quadrants.any(axis=1)
+        if dead.any():
+            self._corner_points.difference_update(map(tuple, points[dead].tolist()))
+
+        # The room can only extend into a quadrant whose corner cell is free
+        offsets = np.array([(-width, -height), (0, -height), (-width, 0), (0, 0)], dtype=np.int64)
+        anchors = (points[:, None, :] + offsets[None, :, :])[quadrants]
+        if len(anchors) == 0:
+            return []
+        anchors = np.unique(anchors, axis=0)
+
+        # Legal anchors are inside the floor box and cover only free cells
+        ax = anchors[:, 0] - self.floor_origin_x
+        ay = anchors[:, 1] - self.floor_origin_y
+        inside = (ax >= 0) & (ay >= 0) & (ax + width <= mask_width) & (ay + height <= mask_height)
+        anchors, ax, ay = anchors[inside], ax[inside], ay[inside]
+        if len(anchors) == 0:
+            return []
+        sat = summed_area_table(free.astype(np.int32))
+        covered = (sat[ay + height, ax + width] - sat[ay, ax + width] -
+                   sat[ay + height, ax] + sat[ay, ax])
+        anchors = anchors[covered == width * height]
+        if len(anchors) == 0:
+            return []
+
+        # Contacts with the indexed rooms around the anchors
+        candidates = np.column_stack([anchors, np.full(len(anchors), width), np.full(len(anchors), height)])
+        gain, penalty, total = self._contact_counts(room, candidates)
+        allowed = penalty == 0
+        anchors, gain, unrelated = anchors[allowed], gain[allowed], (total - gain)[allowed]
+
+        # Rank by adjacency gain, then prefer not to use up the walls of unrelated
+        # rooms, with random tie-breaking so restarts still differ
+        tie_break = np.array([random.random() for _ in range(len(anchors))])
+        order = np.lexsort((tie_break, unrelated, -gain))[:max_positions]
+        return [(int(x), int(y)) for x, y in anchors[order]]
+
+    def rank_candidates(self, room, positions, sliver=None):
+        """
+        Score every (x, y) in positions for room in one vectorized pass; higher is better.
+
+        The score combines, weighted by candidate_weights:
+        - adjacency: shared walls with placed adjacency partners
+        - non_adjacency: shared walls with placed non-adjacent rooms (penalty)
+        - unrelated: shared walls with other placed rooms (penalty)
+        - contact: fraction of the perimeter against placed rooms or the floor edge
+        - fragment: free slabs thinner than sliver left between the room and an
+          obstacle, as a fraction of the room area (penalty). sliver defaults to the
+          smallest side of the rooms still unplaced.
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        count = len(positions)
+        if count == 0:
+            return np.zeros(0)
+        width, height = room.width, room.height
+        weights = self.candidate_weights
+
+        candidates = np.column_stack([positions, np.full(count, width), np.full(count, height)])
+        gain, penalty, total = self._contact_counts(room, candidates)
+        unrelated = total - gain - penalty
+
+        if sliver is None:
+            sizes = [min(other.width, other.height) for other in self.rooms
+                     if other is not room and other not in self._indexed_rects]
+            sliver = min(sizes) if sizes else 1
+        layers = max(int(sliver), 1)  # layer 1 is the contact ring; a wall at layer d leaves a d - 1 slab
+
+        # Blocked cells (off the floor or occupied), padded so every layer can be read
+        blocked = np.ones((self.floor_height - self.floor_origin_y + 2 * layers,
+                           self.floor_width - self.floor_origin_x + 2 * layers), dtype=np.int32)
+        blocked[layers:-layers, layers:-layers] = ~self._free_cells(room)
+        sat = summed_area_table(blocked)
+        x0 = np.clip(positions[:, 0] - self.floor_origin_x + layers, 0, blocked.shape[1] - width)[:, None]
+        y0 = np.clip(positions[:, 1] - self.floor_origin_y + layers, 0, blocked.shape[0] - height)[:, None]
+        depth = np.arange(layers)[None, :]
+        x0, y0 = np.broadcast_to(x0, (count, layers)), np.broadcast_to(y0, (count, layers))
+
+        def box(left, bottom, right, top):
+            return sat[top, right] - sat[bottom, right] - sat[top, left] + sat[bottom, left]
+
+        contact = np.zeros(count)
+        fragment = np.zeros(count)
+        # Per side, blocked cells in each of the layers parallel to it, layer d at distance d + 1
+        sides = [
+            (x0 - depth - 1, y0, x0 - depth, y0 + height, height),  # Left
+            (x0 + width + depth, y0, x0 + width + depth + 1, y0 + height, height),  # Right
+            (x0, y0 - depth - 1, x0 + width, y0 - depth, width),  # Below
+            (x0, y0 + height + depth, x0 + width, y0 + height + depth + 1, width),  # Above
+        ]
+        for left, bottom, right, top, length in sides:
+            layer_blocked = box(left, bottom, right, top)
+            contact += layer_blocked[:, 0]
+            # First layer that is mostly blocked; a free slab before it is too thin to use
+            wall = layer_blocked * 2 >= length
+            first_wall = np.where(wall.any(axis=1), wall.argmax(axis=1), layers)
+            free_before = np.cumsum(length - layer_blocked, axis=1)
+            slab = free_before[np.arange(count), np.maximum(first_wall - 1, 0)]
+            fragment += np.where((first_wall > 0) & (first_wall < layers), slab, 0)
+
+        return (weights['adjacency'] * gain - weights['non_adjacency'] * penalty -
+                weights['unrelated'] * unrelated +
+                weights['contact'] * contact / (2 * (width + height)) -
+                weights['fragment'] * fragment / (width * height))
+
+    def _choose_position(self, room, positions):
+        """Pick the position the placement loop commits, per candidate_ranking"""
+        if not positions:
+            return None
+        if self.candidate_ranking == 'first' or len(positions) == 1:
+            return positions[0]
+        scores = self.rank_candidates(room, positions)
+        # Random tie-breaking so restarts explore different layouts
+        best = np.flatnonzero(scores >= scores.max() - 1e-9)
+        return positions[int(random.choice(best))]
+
+    def get_valid_positions(self, room, max_positions=100, strategy=None):
+        """
+        Get valid positions for a room, prioritizing adjacency requirements.
+        strategy overrides self.candidate_strategy ('random' or 'corners').
+        """
+        if (strategy or self.candidate_strategy) == 'corners':
+            return self.get_corner_positions(room, max_positions)
 
-    def get_valid_positions(self, room, max_positions=100):
-        """Get valid positions for a room, prioritizing adjacency requirements"""
         valid_positions = []
 
         # Get rooms that should be adjacent to this room
         adjacent_rooms = []
         for neighbor in self.adjacency_graph.neighbors(room.name):
-            neighbor_room = next((r for r in self.rooms if r.name == neighbor), None)
+            neighbor_room = self.get_room(neighbor)
             if neighbor_room and neighbor_room.x is not None:
                 adjacent_rooms.append(neighbor_room)
 
@@ -468,137 +1439,217 @@ class FloorPlan:
                             return valid_positions
 
         # If no adjacent rooms or need more positions, try random positions
-        attempts = 0
-        while len(valid_positions) < max_positions and attempts < 200:
-            attempts += 1
-
-            # Choose a random region
-            region = random.choice(self.floor_regions)
+        if len(valid_positions) < max_positions:
+            valid_positions.extend(self._sample_positions(room, max_positions - len(valid_positions),
+                                                          exclude=valid_positions))
+        return valid_positions
 
-            if region['width'] < room.width or region['height'] < room.height:
+    def _sample_positions(self, room, count, exclude=(), samples=200):
+        """
+        Up to count free positions for room, drawn uniformly from random regions.
+        All samples are drawn and checked against a summed-area table of the free
+        cells at once; only the survivors are checked for non-adjacency, in order.
+        """
+        width, height = room.width, room.height
+        regions = self.floor_regions
+        rng = np.random.default_rng(random.getrandbits(64))
+
+        picks = rng.integers(len(regions), size=samples)
+        region_x = np.array([region['x'] for region in regions])[picks]
+        region_y = np.array([region['y'] for region in regions])[picks]
+        slack_x = np.array([region['width'] for region in regions])[picks] - width
+        slack_y = np.array([region['height'] for region in regions])[picks] - height
+        fits = (slack_x >= 0) & (slack_y >= 0)
+        if not fits.any():
+            return []
+        x = region_x[fits] + (rng.random(int(fits.sum())) * (slack_x[fits] + 1)).astype(np.int64)
+        y = region_y[fits] + (rng.random(int(fits.sum())) * (slack_y[fits] + 1)).astype(np.int64)
+
+        sat = summed_area_table(self._free_cells(room).astype(np.int32))
+        x0, y0 = x - self.floor_origin_x, y - self.floor_origin_y
+        covered = sat[y0 + height, x0 + width] - sat[y0, x0 + width] - sat[y0 + height, x0] + sat[y0, x0]
+        free = covered == width * height
+
+        positions = []
+        seen = set(exclude)
+        for position in zip(x[free].tolist(), y[free].tolist()):
+            if position in seen:
                 continue
-
-            max_x = region['x'] + region['width'] - room.width
-            max_y = region['y'] + region['height'] - room.height
-
-            if max_x >= region['x'] and max_y >= region['y']:
-                x = random.randint(region['x'], max_x)
-                y = random.randint(region['y'], max_y)
-
-                if (not self.check_overlap_optimized(room, x, y, room.width, room.height) and
-                        not self.check_non_adjacency_violation(room, x, y, room.width, room.height) and  # ADD THIS LINE
-                        (x, y) not in valid_positions):
-                    valid_positions.append((x, y))
-
-        return valid_positions
+            seen.add(position)
+            if not self.check_non_adjacency_violation(room, position[0], position[1], width, height):
+                positions.append(position)
+                if len(positions) >= count:
+                    break
+        return positions
 
     def add_non_adjacency(self, room1_name, room2_name):
         """Add a non-adjacency constraint between two rooms"""
         if room1_name in self.adjacency_graph.nodes and room2_name in self.adjacency_graph.nodes:
             self.non_adjacency_graph.add_edge(room1_name, room2_name)
+            self._track_constraint_edge(room1_name, room2_name)
 
     def check_non_adjacency_violation(self, room, x, y, width, height):
         """Check if placing a room at (x,y) would violate non-adjacency constraints"""
         # Check if room has any non-adjacency constraints
-        if room.name not in self.non_adjacency_graph.nodes:
+        if room.name not in self.non_adjacency_graph.nodes or not self.non_adjacency_graph[room.name]:
             return False
 
-        for neighbor_name in self.non_adjacency_graph.neighbors(room.name):
-            neighbor_room = next((r for r in self.rooms if r.name == neighbor_name), None)
-            if neighbor_room and neighbor_room.x is not None:
-                # Create temporary room object to check adjacency
-                temp_room = Room(room.name, width, height)
-                temp_room.x = x
-                temp_room.y = y
-
-                if temp_room.has_shared_wall_with(neighbor_room):
-                    return True
-        return False
+        # Look up only the rooms that would actually share a wall at this position
+        forbidden = self.non_adjacency_graph[room.name]
+        return any(other.name in forbidden
+                   for other in self.wall_index.rooms_sharing_wall(x, y, width, height, exclude=room))
 
     def add_room(self, name, width, height, max_expansion=20):
         """Add a room with specified dimensions and maximum expansion limit"""
         room = Room(name, width, height, max_expansion)
         self.rooms.append(room)
+        self._rooms_by_name[name] = room
         self.adjacency_graph.add_node(name)
         self.non_adjacency_graph.add_node(name)  # ADD THIS LINE
         return room
 
+    def fix_room(self, name, x, y, rotated=False):
+        """
+        Pin room name at (x, y) in its original size (turned by 90 degrees if rotated).
+        Placement treats fixed rooms as part of the floor: they are indexed once, never
+        reset or moved, and expansion, compaction and adjacency enforcement leave them
+        alone.
+        """
+        room = self.get_room(name)
+        if room is None:
+            raise ValueError(f"Unknown room '{name}'")
+        room.rotated = rotated
+        room.reset_to_original_size()
+        room.x, room.y = x, y
+        room.fixed = True
+        self._add_to_spatial_index(room)
+        return room
+
+    def unfix_room(self, name):
+        """Let room name be placed by the search again; it keeps its current position"""
+        room = self.get_room(name)
+        if room is None:
+            raise ValueError(f"Unknown room '{name}'")
+        room.fixed = False
+        return room
+
+    def add_fixed_room(self, name, width, height, x, y, rotated=False):
+        """Add a room that is fixed at (x, y), e.g. stairs, elevators or shafts"""
+        self.add_room(name, width, height, max_expansion=0)
+        return self.fix_room(name, x, y, rotated)
+
+    def _is_pinned(self, room):
+        """Whether the restart search must leave room where it is"""
+        return room.fixed or room in self._pinned
+
     def add_adjacency(self, room1_name, room2_name):
         if room1_name in self.adjacency_graph.nodes and room2_name in self.adjacency_graph.nodes:
             self.adjacency_graph.add_edge(room1_name, room2_name)
+            self._track_constraint_edge(room1_name, room2_name)
 
     def is_within_floor(self, x, y, width, height):
         """Check if a rectangle fits within the entire composite floor shape"""
-        for dx in range(width):
-            for dy in range(height):
-                px = x + dx
-                py = y + dy
+        if width <= 0 or height <= 0:
+            return True
 
-                if not self.point_in_floor(px, py):
-                    return False
-        return True
+        # Shift into mask coordinates and reject anything outside the bounding box
+        x0 = x - self.floor_origin_x
+        y0 = y - self.floor_origin_y
+        mask_height, mask_width = self.floor_mask.shape
+        if x0 < 0 or y0 < 0 or x0 + width > mask_width or y0 + height > mask_height:
+            return False
+
+        # Every cell is covered exactly when the covered-cell count equals the area
+        return rect_sum(self.floor_mask_sat, x0, y0, x0 + width, y0 + height) == width * height
 
-    def enforce_minimum_adjacency(self):
+    def enforce_minimum_adjacency(self, max_slots=64):
         """
         Ensure every room is adjacent to at least one other room.
-        If a room has no adjacencies, try to move it next to another room.
+
+        Isolated rooms are read off the contact graph in one sweep. Each one is
+        docked against its placed adjacency partners if possible, else against any
+        room: of the max_slots docking slots nearest to it, those that would not
+        touch a room it must not be adjacent to are ranked and the best is taken.
+        Returns the number of rooms moved.
         """
-        for room in self.rooms:
-            if room.x is None or room.y is None:
+        if not self._index_is_current():
+            self.rebuild_spatial_index()
+        contacts = self.contact_graph()
+        isolated = [room for room in self.rooms
+                    if room.name in contacts and not room.fixed and contacts.degree(room.name) == 0]
+
+        moved = 0
+        for room in isolated:
+            # An earlier room may have docked against this one
+            if self._has_any_shared_wall(room):
                 continue
-
-            # Check if this room shares a wall with any other room
-            has_adjacency = any(
-                room.has_shared_wall_with(other)
-                for other in self.rooms
-                if other != room and other.x is not None and other.y is not None
-            )
-            if not has_adjacency:
-                # Try to move the room next to another room
-                found = False
-                for candidate in self.rooms:
-                    if candidate == room or candidate.x is None or candidate.y is None:
-                        continue
-
-                    # Try all four sides of the candidate room
-                    possible_positions = [
-                        (candidate.x - room.width, candidate.y),  # left
-                        (candidate.x + candidate.width, candidate.y),  # right
-                        (candidate.x, candidate.y + candidate.height),  # above
-                        (candidate.x, candidate.y - room.height),  # below
-                    ]
-                for new_x, new_y in possible_positions:
-                    # Check if the new position would create a non-adjacency violation
-                    is_non_adjacent_violation = False
-                    for existing_room in self.rooms:
-                        if existing_room != room and existing_room.x is not None and existing_room.y is not None:
-                            if self.non_adjacency_graph.has_edge(room.name, existing_room.name):
-                                # Temporarily set room's position to check for wall sharing
-                                original_x, original_y = room.x, room.y
-                                room.x, room.y = new_x, new_y
-                                if room.has_shared_wall_with(existing_room):
-                                    is_non_adjacent_violation = True
-                                room.x, room.y = original_x, original_y  # Restore original position
-                                if is_non_adjacent_violation:
-                                    break
-                    if is_non_adjacent_violation:
-                        continue
-
-                    if self.is_within_floor(new_x, new_y, room.width, room.height) and \
-                            not self.check_overlap(room, new_x, new_y, room.width, room.height):
-                        # Move room here
-                        room.x = new_x
-                        room.y = new_y
-                        # Double-check if this now shares a wall with any room
-                        if any(
-                                room.has_shared_wall_with(other)
-                                for other in self.rooms
-                                if other != room and other.x is not None and other.y is not None
-                        ):
-                            found = True
-                            break
-                if found:
+            partners = [self.get_room(name) for name in self.adjacency_graph[room.name]] \
+                if room.name in self.adjacency_graph else []
+            partners = [partner for partner in partners if partner in self._indexed_rects]
+            for against in ((partners, None) if partners else (None,)):
+                positions = [(x, y) for x, y in self.docking_slots(room, against, limit=max_slots)
+                             if not self.check_non_adjacency_violation(room, x, y, room.width, room.height)]
+                if positions:
                     break
+            if not positions:
+                continue
+            scores = self.rank_candidates(room, positions)
+            x, y = positions[int(np.argmax(scores))]
+            self.move_room(room, x, y)
+            moved += 1
+        return moved
+
+    def docking_slots(self, room, against=None, limit=None):
+        """
+        Free positions where room lies flush against a wall of one of the rooms in
+        against (default: every other indexed room), sharing a stretch of positive
+        length. With limit, only the limit slots nearest to room's current position
+        are returned, nearest first.
+
+        The slots along all walls are enumerated at once and kept only where a
+        summed-area table of the free floor cells (room's own cells count as free)
+        shows the whole rectangle empty.
+        """
+        if against is None:
+            against = self._indexed_rects
+        others = [self._indexed_rects[other] for other in against if other is not room]
+        if not others:
+            return []
+        width, height = room.width, room.height
+        ox, oy, ow, oh = np.array(others, dtype=np.int64).T
+
+        def spans(starts, stops):
+            # Concatenated ranges [start, stop) per wall, with the owning wall index
+            lengths = stops - starts
+            owner = np.repeat(np.arange(len(starts)), lengths)
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            return owner, starts[owner] + offsets
+
+        owner, ys = spans(oy - height + 1, oy + oh)
+        left = np.column_stack([ox[owner] - width, ys])
+        right = np.column_stack([ox[owner] + ow[owner], ys])
+        owner, xs = spans(ox - width + 1, ox + ow)
+        below = np.column_stack([xs, oy[owner] - height])
+        above = np.column_stack([xs, oy[owner] + oh[owner]])
+        anchors = np.concatenate([left, right, below, above])
+
+        mask_height, mask_width = self.floor_mask.shape
+        ax = anchors[:, 0] - self.floor_origin_x
+        ay = anchors[:, 1] - self.floor_origin_y
+        inside = (ax >= 0) & (ay >= 0) & (ax + width <= mask_width) & (ay + height <= mask_height)
+        if not inside.any():
+            return []
+        # A slot can lie against several walls; keep it once
+        cells = np.unique(ay[inside] * mask_width + ax[inside])
+        ax, ay = cells % mask_width, cells // mask_width
+        sat = summed_area_table(self._free_cells(room).astype(np.int32))
+        covered = sat[ay + height, ax + width] - sat[ay, ax + width] - sat[ay + height, ax] + sat[ay, ax]
+        x = ax[covered == width * height] + self.floor_origin_x
+        y = ay[covered == width * height] + self.floor_origin_y
+        if limit is not None and room.x is not None:
+            order = np.argsort(np.abs(x - room.x) + np.abs(y - room.y), kind='stable')[:limit]
+            x, y = x[order], y[order]
+        return list(zip(x.tolist(), y.tolist()))
 
     def point_in_floor(self, x, y):
         """Check if a point is within any of the defined floor regions"""
@@ -609,50 +1660,89 @@ class FloorPlan:
         return False
 
     def check_overlap(self, room, x, y, width, height):
-        """Check if placing a room at (x,y) with given width/height would overlap with existing rooms"""
-        for existing_room in self.rooms:
-            if existing_room.x is not None and existing_room != room:
-                # Check for overlap - two rectangles overlap if they overlap in both x and y directions
-                if (x < existing_room.x + existing_room.width and
-                        x + width > existing_room.x and
-                        y < existing_room.y + existing_room.height and
-                        y + height > existing_room.y):
-                    return True
-        return False
-
-    def evaluate_adjacency_score(self):
-        """Calculate how well adjacency requirements are met and penalize non-adjacency violations"""
-        score = 0
-        adjacent_pairs = []
-        violations = []
+        """
+        Check if placing a room at (x,y) with given width/height would overlap with existing rooms.
+        Unlike check_overlap_optimized this also sees rooms whose x/y were set directly,
+        by re-indexing first when the index is out of date.
+        """
+        if not self._index_is_current():
+            self.rebuild_spatial_index()
+        return self.check_overlap_optimized(room, x, y, width, height)
 
-        # Score positive adjacencies
-        for room1_name, room2_name in self.adjacency_graph.edges:
-            room1 = next(r for r in self.rooms if r.name == room1_name)
-            room2 = next(r for r in self.rooms if r.name == room2_name)
+    def compute_contact_matrices(self):
+        """
+        Boolean room-to-room shared-wall and overlap matrices, indexed like self.rooms.
+        Computed with broadcasting; unplaced rooms have all-False rows and columns.
+        """
+        return contact_matrices(self.rooms)
 
-            if room1.x is None or room2.x is None:
-                continue
+    def constraint_status(self, shared_walls=None):
+        """
+        Classify every constraint edge between placed rooms using the shared-wall matrix.
+        Returns a dict with 'adjacent_pairs', 'unsatisfied_adjacencies',
+        'non_adjacency_satisfied' and 'non_adjacency_violated' lists of name pairs,
+        each in graph edge order.
+        """
+        if shared_walls is None:
+            shared_walls, _ = self.compute_contact_matrices()
+        index = {room.name: i for i, room in enumerate(self.rooms)}
+        placed = np.array([room.x is not None and room.y is not None for room in self.rooms], dtype=bool)
+
+        def split(graph):
+            edges = list(graph.edges)
+            if not edges:
+                return [], []
+            i = np.array([index[a] for a, _ in edges], dtype=np.intp)
+            j = np.array([index[b] for _, b in edges], dtype=np.intp)
+            active = placed[i] & placed[j]
+            touching = shared_walls[i, j]
+            hit = [edge for edge, a, t in zip(edges, active, touching) if a and t]
+            miss = [edge for edge, a, t in zip(edges, active, touching) if a and not t]
+            return hit, miss
+
+        adjacent_pairs, unsatisfied = split(self.adjacency_graph)
+        violated, satisfied = split(self.non_adjacency_graph)
+        return {
+            'adjacent_pairs': adjacent_pairs,
+            'unsatisfied_adjacencies': unsatisfied,
+            'non_adjacency_satisfied': satisfied,
+            'non_adjacency_violated': violated
+        }
+
+    def evaluate_adjacency_score(self, full_recompute=False):
+        """
+        Calculate how well adjacency requirements are met and penalize non-adjacency violations.
 
-            # Check if rooms share a wall
-            if room1.has_shared_wall_with(room2):
-                score += 1
-                adjacent_pairs.append((room1_name, room2_name))
+        Normally this reads the running score kept up to date by the spatial index hooks.
+        full_recompute=True (or an index that is out of date with the rooms) recomputes
+        everything from the shared-wall matrix instead.
+        """
+        if full_recompute or not self._index_is_current():
+            status = self.constraint_status()
+            adjacent_pairs = status['adjacent_pairs']
+            violations = status['non_adjacency_violated']
+        else:
+            adjacent_pairs = [edge for edge in self.adjacency_graph.edges
+                              if frozenset(edge) in self._satisfied_adjacencies]
+            violations = [edge for edge in self.non_adjacency_graph.edges
+                          if frozenset(edge) in self._violated_non_adjacencies]
 
-        # Penalize non-adjacency violations
-        for room1_name, room2_name in self.non_adjacency_graph.edges:
-            room1 = next(r for r in self.rooms if r.name == room1_name)
-            room2 = next(r for r in self.rooms if r.name == room2_name)
+        # One point per satisfied adjacency, heavy penalty for each non-adjacency violation
+        score = len(adjacent_pairs) - 2 * len(violations)
 
-            if room1.x is None or room2.x is None:
-                continue
+        return score, adjacent_pairs, violations  # Modified return to include violations
 
-            # Check if rooms share a wall (violation)
-            if room1.has_shared_wall_with(room2):
-                score -= 2  # Heavy penalty for violations
-                violations.append((room1_name, room2_name))
+    def running_adjacency_score(self):
+        """O(1) adjacency score from the incrementally maintained edge sets"""
+        return len(self._satisfied_adjacencies) - 2 * len(self._violated_non_adjacencies)
 
-        return score, adjacent_pairs, violations  # Modified return to include violations
+    def verify_adjacency_score(self):
+        """Check the running score against a full recompute. Returns True if they agree."""
+        if not self._index_is_current():
+            return False
+        _, adjacent_pairs, violations = self.evaluate_adjacency_score(full_recompute=True)
+        return ({frozenset(edge) for edge in adjacent_pairs} == self._satisfied_adjacencies and
+                {frozenset(edge) for edge in violations} == self._violated_non_adjacencies)
 
     def can_expand_room(self, room, direction, amount):
         """Check if a room can be expanded in the given direction by the specified amount"""
@@ -660,13 +1750,7 @@ class FloorPlan:
             return False
 
         # Calculate total expansion so far
-        current_expansion = 0
-        if not room.rotated:
-            current_expansion += room.width - room.original_width
-            current_expansion += room.height - room.original_height
-        else:
-            current_expansion += room.width - room.original_height
-            current_expansion += room.height - room.original_width
+        current_expansion = self._expansion_used(room)
 
         # Check if we've reached the maximum expansion for this room
         if current_expansion + amount > room.max_expansion:
@@ -705,171 +1789,948 @@ class FloorPlan:
         """
         # For each room, attempt expansion in each direction
         for room in self.rooms:
-            if room.x is None or room.y is None:
+            if room.x is None or room.y is None or self._is_pinned(room):
                 continue
 
             # Try to expand in all four directions
             directions = ['right', 'down', 'left', 'up']
             random.shuffle(directions)  # Randomize direction order for more varied results
+            self._remove_from_spatial_index(room)
 
             for direction in directions:
-                # Try expanding 1 unit at a time up to max expansion
-                expanded = True
-                total_expansion = 0
-
-                while expanded:
-                    if self.can_expand_room(room, direction, 1):
-                        # Apply 1 unit expansion
-                        if direction == 'right':
-                            room.width += 1
-                        elif direction == 'left':
-                            room.x -= 1
-                            room.width += 1
-                        elif direction == 'up':
-                            room.height += 1
-                        elif direction == 'down':
-                            room.y -= 1
-                            room.height += 1
-
-                        total_expansion += 1
-                    else:
-                        expanded = False
+                # Grow straight to the nearest obstacle, floor edge or budget limit
+                self._grow_room(room, direction, self.max_extension(room, direction))
+
+            self._add_to_spatial_index(room)
+
+    def _expansion_used(self, room):
+        """How much of its max_expansion budget room has used"""
+        if not room.rotated:
+            return room.width - room.original_width + room.height - room.original_height
+        return room.width - room.original_height + room.height - room.original_width
+
+    def max_extension(self, room, direction):
+        """
+        Exact number of cells room can grow in direction ('right', 'left', 'up' or
+        'down') before it meets another indexed room, leaves the floor or runs out of
+        max_expansion budget. One slice of the occupancy raster per query: the strip
+        beside the wall, budget cells deep, is scanned for its first blocked row or
+        column.
+        """
+        if room.x is None or room.y is None:
+            return 0
+        budget = room.max_expansion - self._expansion_used(room)
+        if budget <= 0:
+            return 0
+        return self._free_distance(room.x, room.y, room.width, room.height, direction, budget)
 
-    def place_rooms_with_constraints_optimized(self, max_attempts=100, enable_expansion=True, use_compact_mode=True):
+    def _free_distance(self, x, y, width, height, direction, limit=None):
+        """
+        Number of free floor rows or columns directly beside the rectangle in
+        direction, up to limit (default: the floor edge), read from the occupancy
+        raster. The rectangle's own cells are never looked at.
+        """
+        mask_height, mask_width = self.floor_mask.shape
+        x0, y0 = x - self.floor_origin_x, y - self.floor_origin_y
+        x1, y1 = x0 + width, y0 + height
+        if x0 < 0 or y0 < 0 or x1 > mask_width or y1 > mask_height:
+            return 0
+        budget = max(mask_width, mask_height) if limit is None else limit
+
+        if direction == 'right':
+            rows, cols, axis, reverse = slice(y0, y1), slice(x1, min(x1 + budget, mask_width)), 0, False
+        elif direction == 'left':
+            rows, cols, axis, reverse = slice(y0, y1), slice(max(x0 - budget, 0), x0), 0, True
+        elif direction == 'up':
+            rows, cols, axis, reverse = slice(y1, min(y1 + budget, mask_height)), slice(x0, x1), 1, False
+        elif direction == 'down':
+            rows, cols, axis, reverse = slice(max(y0 - budget, 0), y0), slice(x0, x1), 1, True
+        else:
+            return 0
+
+        # One flag per row/column of the strip, ordered away from the wall
+        blocked = ((self.floor_mask[rows, cols] == 0) | (self.occupancy.grid[rows, cols] > 0)).any(axis=axis)
+        if reverse:
+            blocked = blocked[::-1]
+        return int(np.argmax(blocked)) if blocked.any() else len(blocked)
+
+    def _grow_room(self, room, direction, amount):
+        """Move one wall of room outwards by amount cells"""
+        if amount <= 0:
+            return
+        if direction == 'right':
+            room.width += amount
+        elif direction == 'left':
+            room.x -= amount
+            room.width += amount
+        elif direction == 'up':
+            room.height += amount
+        elif direction == 'down':
+            room.y -= amount
+            room.height += amount
+
+    def place_rooms_with_constraints_optimized(self, max_attempts=100, enable_expansion=True, use_compact_mode=True,
+                                               n_workers=None, seed=None):
         """
         Optimized room placement using constraint satisfaction and spatial indexing
+
+        Every attempt is an independent randomized restart. With n_workers > 1 the
+        attempts are fanned out over a process pool (see _place_rooms_parallel);
+        seed makes the run reproducible in either mode.
         """
-        # Clear spatial grid
-        self.spatial_grid = {}
+        # Clear spatial grid and reset all rooms but the fixed ones
+        self._clear_placements()
 
-        # Reset all rooms
-        for room in self.rooms:
-            room.x = None
-            room.y = None
-            room.reset_to_original_size()
+        if n_workers is not None and n_workers > 1:
+            best_score, best_placement = self._place_rooms_parallel(max_attempts, enable_expansion, n_workers, seed)
+        else:
+            if seed is not None:
+                random.seed(seed)
+            best_score, best_placement = self._search_placements(max_attempts, enable_expansion)
+
+        # Restore best placement
+        if best_placement:
+            self._restore_placement(best_placement)
+            return True
 
-        # Sort rooms by constraint priority (rooms with more adjacency requirements first)
+        return False
+
+    def _placement_order(self):
+        """Sort rooms by constraint priority (rooms with more adjacency requirements first)"""
         room_constraints = {}
         for room in self.rooms:
             room_constraints[room.name] = len(list(self.adjacency_graph.neighbors(room.name)))
 
-        sorted_rooms = sorted(self.rooms,
-                              key=lambda r: (room_constraints[r.name], r.get_area()),
-                              reverse=True)
+        return sorted((room for room in self.rooms if not self._is_pinned(room)),
+                      key=lambda r: (room_constraints[r.name], r.get_area()),
+                      reverse=True)
+
+    def _attempt_placement(self, sorted_rooms, enable_expansion=True, should_stop=None):
+        """
+        Run one randomized placement attempt. Returns True if every room was placed.
+        Fixed and pinned rooms stay indexed where they are; only the others are reset.
+        should_stop, if given, is called before every room and before expansion; the
+        attempt is abandoned (returns False) as soon as it returns True.
+        """
+        # Reset placements
+        pinned = [room for room in self._indexed_rects if self._is_pinned(room)]
+        if pinned:
+            for room in list(self._indexed_rects):
+                if not self._is_pinned(room):
+                    self._remove_from_spatial_index(room)
+            self._corner_points = self._region_corner_points()
+            for x, y, width, height in (self._indexed_rects[room] for room in pinned):
+                self._corner_points.update(((x, y), (x + width, y), (x, y + height), (x + width, y + height)))
+        else:
+            self._reset_spatial_index()
+        for room in self.rooms:
+            if self._is_pinned(room):
+                continue
+            room.x = None
+            room.y = None
+            room.reset_to_original_size()
+            if random.random() > 0.5:
+                room.rotate()
+
+        # Use constraint satisfaction approach
+        for room in sorted_rooms:
+            if should_stop is not None and should_stop():
+                return False
+            placed = False
+
+            # Get valid positions for this room and commit the best-ranked one
+            position = self._choose_position(room, self.get_valid_positions(room, max_positions=30))
+
+            # If not placed, try rotated
+            if position is None:
+                room.rotate()
+                position = self._choose_position(room, self.get_valid_positions(room, max_positions=30))
+
+            if position is not None:
+                room.x, room.y = position
+                self._add_to_spatial_index(room)
+                placed = True
+
+            if not placed:
+                return False
+
+        # Apply expansion if enabled
+        if enable_expansion:
+            if should_stop is not None and should_stop():
+                return False
+            self.expand_rooms_optimized()
+        return True
+
+    def _search_placements(self, max_attempts, enable_expansion=True, stop_event=None, target_score=None):
+        """
+        Run up to max_attempts random restarts and return (best_score, best_placement).
+        stop_event is polled between attempts so a parallel search can be cut short.
+        The search also stops once target_score (default: every adjacency) is reached.
+        """
+        sorted_rooms = self._placement_order()
+        if target_score is None:
+            target_score = len(self.adjacency_graph.edges)
 
-        best_score = -1
+        best_score = -math.inf
         best_placement = None
 
         for attempt in range(max_attempts):
-            # Reset placements
-            self.spatial_grid = {}
-            for room in self.rooms:
-                room.x = None
-                room.y = None
-                room.reset_to_original_size()
-                if random.random() > 0.5:
-                    room.rotate()
-
-            # Use constraint satisfaction approach
-            placement_successful = True
+            if stop_event is not None and stop_event.is_set():
+                break
 
-            for room in sorted_rooms:
-                placed = False
+            if self._attempt_placement(sorted_rooms, enable_expansion):
+                # Evaluate this placement from the running score kept by the index
+                score = self.running_adjacency_score()
 
-                # Get valid positions for this room
-                valid_positions = self.get_valid_positions(room, max_positions=30)
+                if score > best_score:
+                    best_score = score
+                    best_placement = self._capture_placement()
 
-                # Try original orientation
-                for x, y in valid_positions:
-                    room.x = x
-                    room.y = y
-                    self._add_to_spatial_grid(room)
-                    placed = True
+                # Early exit if all constraints satisfied
+                if score == target_score:
                     break
 
-                # If not placed, try rotated
-                if not placed:
-                    room.rotate()
-                    valid_positions = self.get_valid_positions(room, max_positions=30)
+        return best_score, best_placement
 
-                    for x, y in valid_positions:
-                        room.x = x
-                        room.y = y
-                        self._add_to_spatial_grid(room)
-                        placed = True
-                        break
+    def _place_rooms_parallel(self, max_attempts, enable_expansion, n_workers, seed=None):
+        """
+        Spread the restarts over a process pool. Each worker gets its own share of the
+        attempts and its own seed; the first worker to satisfy every adjacency sets a
+        shared event so the others stop after their current attempt.
+        """
+        n_workers = min(n_workers, max_attempts)
+        if n_workers <= 0:
+            return -1, None
 
-                if not placed:
-                    placement_successful = False
-                    break
+        base_seed = seed if seed is not None else random.randrange(2 ** 32)
+        chunks = [max_attempts // n_workers + (1 if i < max_attempts % n_workers else 0)
+                  for i in range(n_workers)]
+        target_score = len(self.adjacency_graph.edges)
 
-            if placement_successful:
-                # Apply expansion if enabled
-                if enable_expansion:
-                    self.expand_rooms_optimized()
+        best_score = -math.inf
+        best_placement = None
 
-                # Evaluate this placement
-                score, _, _ = self.evaluate_adjacency_score()
+        with multiprocessing.Manager() as manager:
+            stop_event = manager.Event()
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(_placement_worker, self, attempts, base_seed + i,
+                                    enable_expansion, target_score, stop_event)
+                    for i, attempts in enumerate(chunks)
+                ]
+                # Reduce in submission order so ties resolve the same way for a given seed
+                for future in futures:
+                    score, placement = future.result()
+                    if placement is not None and score > best_score:
+                        best_score = score
+                        best_placement = placement
+
+        return best_score, best_placement
+
+    def _capture_placement(self):
+        """Snapshot the current placement as a list of tuples"""
+        return [
+            (room.name, room.x, room.y, room.width, room.height, room.rotated, room.max_expansion)
+            for room in self.rooms
+        ]
 
-                if score > best_score:
-                    best_score = score
-                    best_placement = [
-                        (room.name, room.x, room.y, room.width, room.height, room.rotated, room.max_expansion)
-                        for room in self.rooms
-                    ]
+    def _restore_placement(self, placement):
+        """Restore a placement produced by _capture_placement"""
+        self._reset_spatial_index()
+        for room_data in placement:
+            name, x, y, width, height, rotated, max_expansion = room_data
+            room = self.get_room(name)
+            if room.fixed:
+                continue
+            room.x = x
+            room.y = y
+            room.width = width
+            room.height = height
+            room.rotated = rotated
+            room.max_expansion = max_expansion
+            self._add_to_spatial_index(room)
+
+    def constraint_components(self):
+        """
+        Split the rooms into groups that share no adjacency or non-adjacency
+        constraint with each other. Returns lists of room names, largest first;
+        rooms without any constraint come back as single-room groups. Fixed rooms are
+        left out, and so are their constraints.
+        """
+        movable = {room.name for room in self.rooms if not room.fixed}
+        constraints = nx.Graph()
+        constraints.add_nodes_from(movable)
+        for graph in (self.adjacency_graph, self.non_adjacency_graph):
+            constraints.add_edges_from((room1_name, room2_name) for room1_name, room2_name in graph.edges
+                                       if room1_name in movable and room2_name in movable)
+        components = [sorted(component) for component in nx.connected_components(constraints)]
+        return sorted(components, key=lambda names: (-len(names), names))
+
+    def _subproblem(self, room_names, region_specs, candidate_strategy=None, with_fixed=False):
+        """
+        A FloorPlan over region_specs holding copies of room_names and the constraints
+        among them. with_fixed also copies the fixed rooms that lie on region_specs,
+        still fixed, for sub-problems that share this plan's coordinates.
+        """
+        sub_plan = FloorPlan(region_specs, candidate_strategy=candidate_strategy or self.candidate_strategy,
+                             candidate_ranking=self.candidate_ranking)
+        names = set(room_names)
+        for name in room_names:
+            room = self.get_room(name)
+            sub_plan.add_room(name, room.original_width, room.original_height, room.max_expansion)
+        if with_fixed:
+            names.update(self._copy_fixed_rooms(sub_plan))
+        for graph, add in ((self.adjacency_graph, sub_plan.add_adjacency),
+                           (self.non_adjacency_graph, sub_plan.add_non_adjacency)):
+            for room1_name, room2_name in graph.edges:
+                if room1_name in names and room2_name in names:
+                    add(room1_name, room2_name)
+        return sub_plan
+
+    def _copy_fixed_rooms(self, other_plan):
+        """Add this plan's fixed rooms that overlap other_plan's floor to it, fixed. Returns their names."""
+        copied = []
+        for room in self.rooms:
+            if not room.fixed or room.x is None:
+                continue
+            rect = (room.x, room.y, room.width, room.height)
+            if not any(intersection_area(rect, (region['x'], region['y'], region['width'], region['height']))
+                       for region in other_plan.floor_regions):
+                continue
+            other_plan.add_room(room.name, room.original_width, room.original_height, 0)
+            other = other_plan.get_room(room.name)
+            other.rotated = room.rotated
+            other.x, other.y, other.width, other.height = rect
+            other.fixed = True
+            other_plan._add_to_spatial_index(other)
+            copied.append(room.name)
+        return copied
+
+    def _layout_component(self, room_names, max_attempts, slacks=(1.5, 2.5, 4.0, None), candidate_strategy=None):
+        """
+        Solve room_names on its own, on a rectangle slack times the rooms' area with
+        the floor's aspect ratio, growing the rectangle until a placement succeeds.
+        None means the real floor_regions (with the fixed rooms on them), for floors
+        whose shape the rectangles miss; the layout then also carries the 'origin'
+        of its box on the floor. Returns a layout dict with the bounding box 'width'
+        and 'height', the 'score' and the 'rooms' as _capture_placement tuples
+        relative to the box, or None. candidate_strategy overrides the one the
+        sub-problem inherits from this plan.
+        """
+        floor_width = self.floor_width - self.floor_origin_x
+        floor_height = self.floor_height - self.floor_origin_y
+        rooms = [self.get_room(name) for name in room_names]
+        area = sum(room.original_width * room.original_height for room in rooms)
+        min_side = max(min(room.original_width, room.original_height) for room in rooms)
+
+        for slack in slacks:
+            if slack is None:
+                sub_plan = self._subproblem(room_names, self.floor_regions, candidate_strategy, with_fixed=True)
+                score, placement = sub_plan._search_placements(max_attempts, enable_expansion=False)
+                if placement is None:
+                    continue
+                placement = [item for item in placement if not sub_plan.get_room(item[0]).fixed]
+                layout = _placement_layout(placement, score)
+                layout['origin'] = (min(item[1] for item in placement), min(item[2] for item in placement))
+                return layout
+
+            width = math.ceil(math.sqrt(area * slack * floor_width / floor_height))
+            width = min(max(width, min_side), floor_width)
+            height = min(max(math.ceil(area * slack / width), min_side), floor_height)
+            sub_plan = self._subproblem(room_names, [{'x': 0, 'y': 0, 'width': width, 'height': height}],
+                                        candidate_strategy)
+            score, placement = sub_plan._search_placements(max_attempts, enable_expansion=False)
+            if placement is not None:
+                return _placement_layout(placement, score)
+        return None
+
+    def place_rooms_by_components(self, max_attempts=100, enable_expansion=True, n_workers=None, seed=None):
+        """
+        Decomposed placement: every constraint component (see constraint_components)
+        with more than one room is solved on its own with up to max_attempts restarts,
+        in a process pool when n_workers > 1. The component layouts are then put on
+        the floor largest first, where they were solved if that was on the floor
+        itself and the spot is still free, else packed by bounding box. The rooms of
+        components that do not fit and the unconstrained rooms are then placed into
+        the space left with up to max_attempts restarts around them (see
+        _place_unplaced). Returns True if every room was placed.
+        """
+        self._clear_placements()
+        if seed is not None:
+            random.seed(seed)
+
+        components = self.constraint_components()
+        groups = [names for names in components if len(names) > 1]
+        loose = [self.get_room(names[0]) for names in components if len(names) == 1]
+
+        if n_workers is not None and n_workers > 1 and len(groups) > 1:
+            base_seed = seed if seed is not None else random.randrange(2 ** 32)
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(groups))) as executor:
+                futures = [executor.submit(_component_worker, self, names, max_attempts, base_seed + i)
+                           for i, names in enumerate(groups)]
+                layouts = [future.result() for future in futures]
+        else:
+            layouts = [self._layout_component(names, max_attempts) for names in groups]
 
-                # Early exit if all constraints satisfied
-                if score == len(self.adjacency_graph.edges):
+        for layout in sorted((layout for layout in layouts if layout is not None),
+                             key=lambda layout: -layout['width'] * layout['height']):
+            if 'origin' in layout and self._layout_fits(layout, *layout['origin']):
+                self._place_layout(layout, *layout['origin'])
+            else:
+                self._pack_layout(layout)
+
+        # Rooms without a placed box and the unconstrained ones
+        if not self._place_unplaced(max_attempts):
+            return False
+
+        # Components ignore fixed rooms, so pull their partners over afterwards
+        to_fixed = [(room1_name, room2_name) for room1_name, room2_name in self.adjacency_graph.edges
+                    if self.get_room(room1_name).fixed != self.get_room(room2_name).fixed]
+        if to_fixed:
+            self.refine_adjacencies(edges=to_fixed)
+
+        if enable_expansion:
+            self.expand_rooms_optimized()
+        return True
+
+    def _pack_layout(self, layout):
+        """
+        Place a _layout_component layout at the lowest, then leftmost, position where
+        its whole bounding box is free floor and none of its rooms shares a wall with
+        a room it must not be adjacent to (such as a fixed room), trying it as given
+        and rotated by 90 degrees. Returns False if the box fits nowhere.
+        """
+        free = self._free_cells()
+        sat = summed_area_table(free.astype(np.int32))
+        mask_height, mask_width = free.shape
+
+        best = None
+        for candidate in (layout, _rotate_layout(layout)):
+            width, height = candidate['width'], candidate['height']
+            if width > mask_width or height > mask_height:
+                continue
+            windows = sat[height:, width:] - sat[:-height, width:] - sat[height:, :-width] + sat[:-height, :-width]
+            for index in np.flatnonzero((windows == width * height).ravel()).tolist():
+                y, x = divmod(index, windows.shape[1])
+                if best is not None and (y, x) >= best[:2]:
                     break
+                if not self._layout_violates_non_adjacency(candidate, self.floor_origin_x + x,
+                                                           self.floor_origin_y + y):
+                    best = (y, x, candidate)
+                    break
+        if best is None:
+            return False
 
-        # Restore best placement
-        if best_placement:
-            self.spatial_grid = {}
-            for room_data in best_placement:
-                name, x, y, width, height, rotated, max_expansion = room_data
-                room = next(r for r in self.rooms if r.name == name)
-                room.x = x
-                room.y = y
-                room.width = width
-                room.height = height
-                room.rotated = rotated
-                room.max_expansion = max_expansion
-                self._add_to_spatial_grid(room)
+        y, x, candidate = best
+        self._place_layout(candidate, self.floor_origin_x + x, self.floor_origin_y + y)
+        return True
+
+    def _layout_fits(self, layout, x, y):
+        """
+        Check if every room of a _layout_component layout is free floor with its box
+        at (x, y), without touching a room it must not be adjacent to
+        """
+        for name, dx, dy, width, height, _, _ in layout['rooms']:
+            room = self.get_room(name)
+            if not self.is_within_floor(x + dx, y + dy, width, height) or \
+                    self.check_overlap_optimized(room, x + dx, y + dy, width, height):
+                return False
+        return not self._layout_violates_non_adjacency(layout, x, y)
+
+    def _layout_violates_non_adjacency(self, layout, x, y):
+        """Check if a room of a layout with its box at (x, y) would share a wall with a placed forbidden room"""
+        for name, dx, dy, width, height, _, _ in layout['rooms']:
+            room = self.get_room(name)
+            if self.check_non_adjacency_violation(room, x + dx, y + dy, width, height):
+                return True
+        return False
+
+    def _place_unplaced(self, max_attempts):
+        """
+        Place every room that has no position yet with up to max_attempts restarts,
+        while the rooms already placed stay pinned. Returns True if all were placed.
+        """
+        unplaced = {room.name for room in self.rooms if room.x is None or room.y is None}
+        if not unplaced:
             return True
+        self._pinned = set(self._indexed_rects)
+        # Edges among pinned rooms are settled; stop once every other edge is satisfied
+        target_score = self.running_adjacency_score() + sum(
+            1 for room1_name, room2_name in self.adjacency_graph.edges
+            if room1_name in unplaced or room2_name in unplaced)
+        try:
+            _, placement = self._search_placements(max_attempts, enable_expansion=False, target_score=target_score)
+        finally:
+            self._pinned = set()
+        if placement is None:
+            return False
+        self._restore_placement(placement)
+        return True
+
+    def _place_layout(self, layout, x, y):
+        """Place the rooms of a _layout_component layout with its bounding box at (x, y)"""
+        for name, dx, dy, width, height, rotated, max_expansion in layout['rooms']:
+            room = self.get_room(name)
+            room.x = x + dx
+            room.y = y + dy
+            room.width = width
+            room.height = height
+            room.rotated = rotated
+            room.max_expansion = max_expansion
+            self._add_to_spatial_index(room)
+
+    def refine_adjacencies(self, passes=2, edges=None):
+        """
+        Sweep over the unsatisfied adjacencies among edges (all of them by default)
+        and try to move either room of each pair flush against the other, keeping a
+        move only if the running score rises. Stops after passes sweeps or a sweep
+        without improvement. Returns the number of moves kept.
+        """
+        edges = list(self.adjacency_graph.edges if edges is None else edges)
+        kept = 0
+        for _ in range(passes):
+            improved = 0
+            for room1_name, room2_name in edges:
+                if frozenset((room1_name, room2_name)) in self._satisfied_adjacencies:
+                    continue
+                for mover_name, partner_name in ((room1_name, room2_name), (room2_name, room1_name)):
+                    if self._move_next_to(self.get_room(mover_name), self.get_room(partner_name)):
+                        improved += 1
+                        break
+            kept += improved
+            if not improved:
+                break
+        return kept
 
+    def _move_next_to(self, room, partner):
+        """Move room to the best-ranked free position flush against partner if that raises the score"""
+        if room.fixed or room.x is None or partner.x is None:
+            return False
+        width, height = room.width, room.height
+        positions = [(partner.x - width, y) for y in range(partner.y - height + 1, partner.y + partner.height)]
+        positions += [(partner.x + partner.width, y) for y in range(partner.y - height + 1, partner.y + partner.height)]
+        positions += [(x, partner.y - height) for x in range(partner.x - width + 1, partner.x + partner.width)]
+        positions += [(x, partner.y + partner.height) for x in range(partner.x - width + 1, partner.x + partner.width)]
+        positions = [(x, y) for x, y in positions
+                     if self.is_within_floor(x, y, width, height) and
+                     not self.check_overlap_optimized(room, x, y, width, height) and
+                     not self.check_non_adjacency_violation(room, x, y, width, height)]
+        if not positions:
+            return False
+
+        scores = self.rank_candidates(room, positions)
+        x, y = positions[int(np.argmax(scores))]
+        before = self.running_adjacency_score()
+        old_x, old_y = room.x, room.y
+        self.move_room(room, x, y)
+        if self.running_adjacency_score() > before:
+            return True
+        self.move_room(room, old_x, old_y)
         return False
 
+    def relayout(self, prior=None, changed=None, radius=None, max_attempts=10, enable_expansion=True, seed=None,
+                 prior_constraints=None):
+        """
+        Warm-start re-layout after a small edit.
+
+        prior is the previous placement: a list of room_placements dictionaries as
+        saved in the JSON results, a list of Room objects or a FloorPlan. None uses
+        the rooms' current positions. Rooms of prior are put back where they were,
+        except the changed ones: the names in changed, plus every room that is new,
+        has other original dimensions or max_expansion than before, is an end of a
+        constraint edge that was added or removed, or no longer fits where it was.
+        The previous constraints are read from a FloorPlan prior, or from
+        prior_constraints, a dict with 'adjacencies' and 'non_adjacencies' lists of
+        name pairs; without either, edges are not compared.
+        The changed rooms and every room within radius cells of them or of their
+        placed adjacency partners (default: half the longest side of a changed room)
+        are then re-solved with up to max_attempts restarts while the rest stays
+        pinned. If that fails the neighbourhood is doubled once. If nothing changed
+        the prior layout is kept as it is. Returns True if every room was placed and
+        False if both neighbourhoods failed, leaving a full search to the caller.
+        """
+        previous = self._prior_rects(prior)
+        changed = set(changed) if changed is not None else set()
+        for room in self.rooms:
+            rect = previous.get(room.name)
+            if rect is None or rect['original'] not in (None, (room.original_width, room.original_height)) or \
+                    rect['max_expansion'] not in (None, room.max_expansion):
+                changed.add(room.name)
+
+        if isinstance(prior, FloorPlan) and prior_constraints is None:
+            prior_constraints = {'adjacencies': list(prior.adjacency_graph.edges),
+                                 'non_adjacencies': list(prior.non_adjacency_graph.edges)}
+        if prior_constraints is not None:
+            for key, graph in (('adjacencies', self.adjacency_graph), ('non_adjacencies', self.non_adjacency_graph)):
+                before = {frozenset(edge) for edge in prior_constraints.get(key, ())}
+                now = {frozenset(edge) for edge in graph.edges}
+                for edge in before ^ now:
+                    changed.update(name for name in edge if self.get_room(name) is not None)
+
+        if seed is not None:
+            random.seed(seed)
+
+        for scale in (1, 2):
+            self._restore_prior(previous, changed)
+            unplaced = [room for room in self.rooms if room.x is None]
+            if not unplaced:
+                # Nothing changed and everything still fits
+                return True
+            if radius is None:
+                radius = max(math.ceil(max(room.original_width, room.original_height) / 2) for room in unplaced)
+
+            free = set(unplaced) | set(self._rooms_near(unplaced, previous, radius * scale))
+            free = {room for room in free if not room.fixed}
+            for room in free:
+                if room in self._indexed_rects:
+                    self._remove_from_spatial_index(room)
+                    room.x = None
+                    room.y = None
+                    room.reset_to_original_size()
+
+            self._pinned = {room for room in self.rooms if room not in free}
+            # Edges among pinned rooms are settled; every other edge could still be satisfied
+            target_score = self.running_adjacency_score() + sum(
+                1 for room1_name, room2_name in self.adjacency_graph.edges
+                if self.get_room(room1_name) in free or self.get_room(room2_name) in free)
+            try:
+                _, placement = self._search_placements(max_attempts, enable_expansion, target_score=target_score)
+            finally:
+                self._pinned = set()
+            if placement is not None:
+                self._restore_placement(placement)
+                return True
+
+        self._clear_placements()
+        return False
+
+    def _restore_prior(self, previous, changed):
+        """Put every room that is neither fixed nor changed back at its previous rectangle if it still fits there"""
+        self._clear_placements()
+        for room in self.rooms:
+            rect = previous.get(room.name)
+            if room.fixed or room.name in changed or rect is None:
+                continue
+            x, y, width, height = rect['x'], rect['y'], rect['width'], rect['height']
+            if self.is_within_floor(x, y, width, height) and \
+                    not self.check_overlap_optimized(room, x, y, width, height):
+                room.x, room.y, room.width, room.height, room.rotated = x, y, width, height, rect['rotated']
+                self._add_to_spatial_index(room)
+
+    def _prior_rects(self, prior):
+        """Normalize a relayout prior into {name: rect dictionary}"""
+        if prior is None:
+            prior = self.rooms
+        elif isinstance(prior, FloorPlan):
+            prior = prior.rooms
+        rects = {}
+        for item in prior:
+            if isinstance(item, Room):
+                if item.x is None or item.y is None:
+                    continue
+                rects[item.name] = {'x': item.x, 'y': item.y, 'width': item.width, 'height': item.height,
+                                    'rotated': item.rotated,
+                                    'original': (item.original_width, item.original_height),
+                                    'max_expansion': item.max_expansion}
+            else:
+                original = None
+                if 'original_width' in item and 'original_height' in item:
+                    original = (item['original_width'], item['original_height'])
+                rects[item['name']] = {'x': item['x'], 'y': item['y'], 'width': item['width'],
+                                       'height': item['height'], 'rotated': item.get('rotated', False),
+                                       'original': original, 'max_expansion': item.get('max_expansion')}
+        return rects
+
+    def _rooms_near(self, rooms, previous, radius):
+        """
+        Indexed rooms within radius cells of the previous positions of rooms or of
+        their placed adjacency partners
+        """
+        anchors = []
+        for room in rooms:
+            rect = previous.get(room.name)
+            if rect is not None:
+                anchors.append((rect['x'], rect['y'], rect['width'], rect['height']))
+            if room.name in self.adjacency_graph:
+                for name in self.adjacency_graph.neighbors(room.name):
+                    partner = self.get_room(name)
+                    if partner in self._indexed_rects:
+                        anchors.append(self._indexed_rects[partner])
+
+        near = set()
+        for x, y, width, height in anchors:
+            near.update(self.spatial_index.query_rect(x - radius, y - radius,
+                                                      width + 2 * radius, height + 2 * radius))
+        return near
+
+    def assign_rooms_to_regions(self, fill=0.85):
+        """
+        Bin-pack the rooms into floor_regions. Rooms go, most constrained and largest
+        first, to the region that already holds the most of their adjacency partners
+        (minus twice their non-adjacent rooms), among the regions they fit in with
+        area to spare; a region is considered full at fill times its area. Ties go to
+        the region with the largest share of free capacity.
+
+        Returns (assignment, unassigned): a list of room names per region, in
+        floor_regions order, and the rooms that fit no region.
+        """
+        capacity = [region['width'] * region['height'] * fill -
+                    sum(intersection_area((room.x, room.y, room.width, room.height),
+                                          (region['x'], region['y'], region['width'], region['height']))
+                        for room in self.rooms if room.fixed and room.x is not None)
+                    for region in self.floor_regions]
+        assignment = [[] for _ in self.floor_regions]
+        region_of = {}
+        unassigned = []
+
+        for room in self._placement_order():
+            area = room.original_width * room.original_height
+            candidates = [index for index, region in enumerate(self.floor_regions)
+                          if any(region['width'] >= width and region['height'] >= height
+                                 for width, height in ((room.original_width, room.original_height),
+                                                       (room.original_height, room.original_width)))]
+            if not candidates:
+                unassigned.append(room.name)
+                continue
+
+            def affinity(index):
+                partners = sum(1 for name in self.adjacency_graph[room.name] if region_of.get(name) == index) \
+                    if room.name in self.adjacency_graph else 0
+                forbidden = sum(1 for name in self.non_adjacency_graph[room.name] if region_of.get(name) == index) \
+                    if room.name in self.non_adjacency_graph else 0
+                return partners - 2 * forbidden
+
+            open_regions = [index for index in candidates if capacity[index] >= area]
+            pool = open_regions or candidates
+            best = max(pool, key=lambda index: (affinity(index) if open_regions else 0,
+                                                  capacity[index] / (self.floor_regions[index]['width'] *
+                                                                     self.floor_regions[index]['height'])))
+            assignment[best].append(room.name)
+            region_of[room.name] = best
+            capacity[best] -= area
+        return assignment, unassigned
+
+    def place_rooms_by_regions(self, max_attempts=100, enable_expansion=True, n_workers=None, seed=None,
+                               stitch_passes=2):
+        """
+        Region-first placement: assign_rooms_to_regions, then solve each region as its
+        own single-rectangle sub-problem with up to max_attempts restarts (in a
+        process pool when n_workers > 1), and finally stitch the regions together.
+        Stitching places the rooms that were left over, whose region failed, that
+        collide where regions overlap or that would share a wall with a room they
+        must not be adjacent to across a region border, then runs refine_adjacencies over the
+        adjacencies that cross regions. Returns True if every room was placed.
+        """
+        self._clear_placements()
+        if seed is not None:
+            random.seed(seed)
+
+        assignment, pending_names = self.assign_rooms_to_regions()
+        jobs = [(names, region) for names, region in zip(assignment, self.floor_regions) if names]
+
+        if n_workers is not None and n_workers > 1 and len(jobs) > 1:
+            base_seed = seed if seed is not None else random.randrange(2 ** 32)
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(jobs))) as executor:
+                futures = [executor.submit(_region_worker, self, names, region, max_attempts, base_seed + i)
+                           for i, (names, region) in enumerate(jobs)]
+                placements = [future.result() for future in futures]
+        else:
+            placements = [self._subproblem(names, [region], with_fixed=True)._search_placements(
+                max_attempts, enable_expansion=False)[1] for names, region in jobs]
+
+        for (names, _), placement in zip(jobs, placements):
+            if placement is None:
+                pending_names.extend(names)
+                continue
+            for name, x, y, width, height, rotated, max_expansion in placement:
+                room = self.get_room(name)
+                if room.fixed:
+                    continue
+                # Regions are solved apart, so rooms may collide or touch forbidden rooms across borders
+                if self.check_overlap_optimized(room, x, y, width, height) or \
+                        self.check_non_adjacency_violation(room, x, y, width, height):
+                    pending_names.append(name)
+                    continue
+                room.x, room.y, room.width, room.height, room.rotated = x, y, width, height, rotated
+                self._add_to_spatial_index(room)
+
+        pending = sorted((self.get_room(name) for name in pending_names), key=lambda room: room.get_area(),
+                         reverse=True)
+        for room in pending:
+            room.reset_to_original_size()
+            position = self._choose_position(room, self.get_valid_positions(room, max_positions=30))
+            if position is None:
+                room.rotate()
+                position = self._choose_position(room, self.get_valid_positions(room, max_positions=30))
+            if position is None:
+                return False
+            room.x, room.y = position
+            self._add_to_spatial_index(room)
+
+        region_of = {name: index for index, names in enumerate(assignment) for name in names}
+        crossing = [(room1_name, room2_name) for room1_name, room2_name in self.adjacency_graph.edges
+                    if region_of.get(room1_name) != region_of.get(room2_name) or
+                    region_of.get(room1_name) is None]
+        self.refine_adjacencies(stitch_passes, edges=crossing)
+
+        if enable_expansion:
+            self.expand_rooms_optimized()
+        return True
+
     def expand_rooms_optimized(self):
         """Optimized room expansion using spatial grid"""
+        if self.expansion_mode == 'wavefront':
+            self.expand_rooms_wavefront()
+            return
+
         for room in self.rooms:
-            if room.x is None or room.y is None:
+            if room.x is None or room.y is None or self._is_pinned(room):
                 continue
 
             # Remove from spatial grid temporarily
-            self._remove_from_spatial_grid(room)
+            self._remove_from_spatial_index(room)
 
             # Try expansion in each direction
             directions = ['right', 'down', 'left', 'up']
             random.shuffle(directions)
 
             for direction in directions:
-                # Try expanding in larger increments first, then smaller
-                for increment in [5, 3, 2, 1]:
-                    while self.can_expand_room_optimized(room, direction, increment):
-                        # Apply expansion
-                        if direction == 'right':
-                            room.width += increment
-                        elif direction == 'left':
-                            room.x -= increment
-                            room.width += increment
-                        elif direction == 'up':
-                            room.height += increment
-                        elif direction == 'down':
-                            room.y -= increment
-                            room.height += increment
+                # One exact query per direction instead of probing increments
+                self._grow_room(room, direction, self.max_extension(room, direction))
 
             # Add back to spatial grid
-            self._add_to_spatial_grid(room)
+            self._add_to_spatial_index(room)
+
+    def label_raster(self, rooms=None):
+        """
+        Raster of the floor bounding box: -1 off the floor, 0 free floor and k + 1
+        where rooms[k] (default: every placed room) lies. Returns (labels, rooms).
+        """
+        if rooms is None:
+            rooms = [room for room in self.rooms if room.x is not None and room.y is not None]
+        labels = np.where(self.floor_mask > 0, 0, -1).astype(np.int32)
+        for index, room in enumerate(rooms):
+            x0, y0 = room.x - self.floor_origin_x, room.y - self.floor_origin_y
+            labels[max(y0, 0):y0 + room.height, max(x0, 0):x0 + room.width] = index + 1
+        return labels, rooms
+
+    def expand_rooms_wavefront(self, priority=None):
+        """
+        Grow all rooms together, one ring at a time, on a label_raster.
+
+        Each ring gathers the one-cell strips in front of every wall of every room
+        (as many walls per room as it has max_expansion budget left, in a direction
+        order that rotates between rings) and resolves them as one set. A strip is
+        claimed only if it is free floor; when strips of several rooms claim the
+        same cell, the room with the best priority wins every such cell and the
+        others keep that wall this ring. A room that wins walls on both axes keeps
+        only one axis per ring (alternating), since the corner cell between the two
+        strips is claimed by neither. priority is an optional callable room -> sort
+        key (smaller wins), evaluated once; by default the room that has grown
+        least wins, so the slack is shared. Rings repeat until nothing grows. Fixed
+        and pinned rooms do not grow.
+        """
+        labels, rooms = self.label_raster()
+        if not rooms:
+            return
+        mask_height, mask_width = labels.shape
+        x0 = np.array([room.x - self.floor_origin_x for room in rooms], dtype=np.int64)
+        y0 = np.array([room.y - self.floor_origin_y for room in rooms], dtype=np.int64)
+        x1 = x0 + np.array([room.width for room in rooms], dtype=np.int64)
+        y1 = y0 + np.array([room.height for room in rooms], dtype=np.int64)
+        budget = np.array([0 if self._is_pinned(room) else room.max_expansion - self._expansion_used(room)
+                           for room in rooms], dtype=np.int64)
+        grown = np.zeros(len(rooms), dtype=np.int64)
+        if priority is not None:
+            static_rank = np.argsort(np.argsort([priority(room) for room in rooms], kind='stable'), kind='stable')
+
+        directions = ('right', 'up', 'left', 'down')
+        ring = 0
+        while (budget > 0).any():
+            if priority is None:
+                # Least grown first, then the largest remaining budget, then room order
+                rank = np.argsort(np.lexsort((np.arange(len(rooms)), -budget, grown)), kind='stable')
+            else:
+                rank = static_rank
+
+            # Every free strip in front of a wall that may move this ring, cell by cell
+            sat = summed_area_table((labels != 0).astype(np.int32))
+            claimed = np.zeros(len(rooms), dtype=np.int64)
+            owners, codes, cells_x, cells_y = [], [], [], []
+            for step in range(4):
+                code = (ring + step) % 4
+                direction = directions[code]
+                if direction == 'right':
+                    sx0, sx1, sy0, sy1 = x1, x1 + 1, y0, y1
+                elif direction == 'left':
+                    sx0, sx1, sy0, sy1 = x0 - 1, x0, y0, y1
+                elif direction == 'up':
+                    sx0, sx1, sy0, sy1 = x0, x1, y1, y1 + 1
+                else:
+                    sx0, sx1, sy0, sy1 = x0, x1, y0 - 1, y0
+
+                movable = np.flatnonzero((budget > claimed) & (sx0 >= 0) & (sy0 >= 0) &
+                                         (sx1 <= mask_width) & (sy1 <= mask_height))
+                if len(movable) == 0:
+                    continue
+                blocked = (sat[sy1[movable], sx1[movable]] - sat[sy0[movable], sx1[movable]] -
+                           sat[sy1[movable], sx0[movable]] + sat[sy0[movable], sx0[movable]])
+                movable = movable[blocked == 0]
+                if len(movable) == 0:
+                    continue
+                claimed[movable] += 1
+
+                lengths = (sx1 - sx0)[movable] * (sy1 - sy0)[movable]
+                owner = np.repeat(movable, lengths)
+                offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                if direction in ('right', 'left'):
+                    cells_x.append(sx0[owner])
+                    cells_y.append(sy0[owner] + offset)
+                else:
+                    cells_x.append(sx0[owner] + offset)
+                    cells_y.append(sy0[owner])
+                owners.append(owner)
+                codes.append(np.full(len(owner), code))
+            if not owners:
+                break
+
+            # Let the best-ranked claimant win each cell; a strip moves only if it wins all its cells
+            owner = np.concatenate(owners)
+            code = np.concatenate(codes)
+            cell_x, cell_y = np.concatenate(cells_x), np.concatenate(cells_y)
+            cell = cell_y * mask_width + cell_x
+            claim = owner * 4 + code
+            best = np.full(labels.size, len(rooms), dtype=np.int64)
+            np.minimum.at(best, cell, rank[owner])
+            won = ~np.isin(claim, np.unique(claim[best[cell] != rank[owner]]))
+
+            # Rooms that won walls on both axes keep only one axis this ring
+            horizontal = (code == 0) | (code == 2)
+            both = np.intersect1d(owner[won & horizontal], owner[won & ~horizontal])
+            dropped_axis = ~horizontal if ring % 2 == 0 else horizontal
+            won &= ~(np.isin(owner, both) & dropped_axis)
+            if not won.any():
+                break
+
+            labels[cell_y[won], cell_x[won]] = owner[won] + 1
+            moved = np.unique(claim[won])
+            movers, moved_codes = moved // 4, moved % 4
+            x1[movers[moved_codes == 0]] += 1
+            y1[movers[moved_codes == 1]] += 1
+            x0[movers[moved_codes == 2]] -= 1
+            y0[movers[moved_codes == 3]] -= 1
+            np.subtract.at(budget, movers, 1)
+            np.add.at(grown, movers, 1)
+            ring += 1
+
+        for index in np.flatnonzero(grown):
+            room = rooms[index]
+            self._remove_from_spatial_index(room)
+            room.x = int(x0[index]) + self.floor_origin_x
+            room.y = int(y0[index]) + self.floor_origin_y
+            room.width = int(x1[index] - x0[index])
+            room.height = int(y1[index] - y0[index])
+            self._add_to_spatial_index(room)
 
     def can_expand_room_optimized(self, room, direction, amount):
         """Optimized room expansion check"""
@@ -877,13 +2738,7 @@ class FloorPlan:
             return False
 
         # Check expansion limits
-        current_expansion = 0
-        if not room.rotated:
-            current_expansion += room.width - room.original_width
-            current_expansion += room.height - room.original_height
-        else:
-            current_expansion += room.width - room.original_height
-            current_expansion += room.height - room.original_width
+        current_expansion = self._expansion_used(room)
 
         if current_expansion + amount > room.max_expansion:
             return False
@@ -967,8 +2822,8 @@ class FloorPlan:
 
         # Add adjacency relationships as dotted lines between room centers
         for room1_name, room2_name in self.adjacency_graph.edges:
-            room1 = next(r for r in self.rooms if r.name == room1_name)
-            room2 = next(r for r in self.rooms if r.name == room2_name)
+            room1 = self.get_room(room1_name)
+            room2 = self.get_room(room2_name)
 
             if room1.x is not None and room2.x is not None:
                 center1 = (room1.x + room1.width / 2, room1.y + room1.height / 2)
@@ -993,8 +2848,8 @@ class FloorPlan:
         non_adjacency_violated = []
 
         for room1_name, room2_name in self.non_adjacency_graph.edges:
-            room1 = next(r for r in self.rooms if r.name == room1_name)
-            room2 = next(r for r in self.rooms if r.name == room2_name)
+            room1 = self.get_room(room1_name)
+            room2 = self.get_room(room2_name)
 
             if room1.x is not None and room2.x is not None:
                 center1 = (room1.x + room1.width / 2, room1.y + room1.height / 2)
@@ -1134,7 +2989,97 @@ class FloorPlan:
                 print(f"{room.name}: {room.original_width}x{room.original_height} → {room.width}x{room.height} " +
                       f"({expansion_pct:.1f}% increase, expansion used: {expansion_usage})")
 
-    def generate_layout(self, max_attempts=1000, enable_expansion=True, enable_space_optimization=True):
+    def check_feasibility(self):
+        """
+        Cheap pre-flight analysis that rejects inputs no amount of attempts can place.
+        Checks total room area against floor area, whether each room fits anywhere on
+        the floor in either orientation, whether each room's perimeter (at full
+        expansion) has room for all of its required neighbours, and whether any pair
+        is required to be both adjacent and non-adjacent. Returns a FeasibilityReport.
+        """
+        reasons = []
+
+        # Total area: rooms are never smaller than their original size
+        floor_area = int(self.floor_mask.sum())
+        room_area = sum(room.original_width * room.original_height for room in self.rooms)
+        if room_area > floor_area:
+            reasons.append(InfeasibilityReason(
+                code='total_area',
+                message=f"Total room area {room_area} exceeds floor area {floor_area}",
+                rooms=[room.name for room in self.rooms]
+            ))
+
+        # Per-room fit: first against single regions, then anywhere on the composite floor
+        for room in self.rooms:
+            orientations = {(room.original_width, room.original_height), (room.original_height, room.original_width)}
+            fits = any(region['width'] >= width and region['height'] >= height
+                       for region in self.floor_regions for width, height in orientations)
+            if not fits:
+                fits = any(self._fits_anywhere(width, height) for width, height in orientations)
+            if not fits:
+                reasons.append(InfeasibilityReason(
+                    code='room_does_not_fit',
+                    message=(f"Room {room.name} ({room.original_width}x{room.original_height}) "
+                             f"does not fit anywhere on the floor in either orientation"),
+                    rooms=[room.name]
+                ))
+
+        # Adjacency degree: each required neighbour needs at least one unit of wall
+        for room in self.rooms:
+            if room.name not in self.adjacency_graph:
+                continue
+            degree = self.adjacency_graph.degree(room.name)
+            max_perimeter = 2 * (room.original_width + room.original_height + room.max_expansion)
+            if degree > max_perimeter:
+                reasons.append(InfeasibilityReason(
+                    code='adjacency_degree',
+                    message=(f"Room {room.name} needs {degree} neighbours but its perimeter "
+                             f"can touch at most {max_perimeter}"),
+                    rooms=[room.name] + list(self.adjacency_graph.neighbors(room.name))
+                ))
+
+        # Fixed rooms must lie on the floor and must not overlap each other
+        fixed = [room for room in self.rooms if room.fixed and room.x is not None]
+        for index, room in enumerate(fixed):
+            rect = (room.x, room.y, room.width, room.height)
+            if not self.is_within_floor(*rect):
+                reasons.append(InfeasibilityReason(
+                    code='fixed_room_conflict',
+                    message=f"Fixed room {room.name} at ({room.x}, {room.y}) is not on the floor",
+                    rooms=[room.name]
+                ))
+            for other in fixed[index + 1:]:
+                if intersection_area(rect, (other.x, other.y, other.width, other.height)):
+                    reasons.append(InfeasibilityReason(
+                        code='fixed_room_conflict',
+                        message=f"Fixed rooms {room.name} and {other.name} overlap",
+                        rooms=[room.name, other.name]
+                    ))
+
+        # A pair cannot be required to be both adjacent and non-adjacent
+        for room1_name, room2_name in self.non_adjacency_graph.edges:
+            if self.adjacency_graph.has_edge(room1_name, room2_name):
+                reasons.append(InfeasibilityReason(
+                    code='conflicting_constraints',
+                    message=f"Rooms {room1_name} and {room2_name} are required to be both adjacent and non-adjacent",
+                    rooms=[room1_name, room2_name]
+                ))
+
+        return FeasibilityReport(feasible=not reasons, reasons=reasons)
+
+    def _fits_anywhere(self, width, height):
+        """Check if a width x height rectangle fits at any position of the floor mask"""
+        mask_height, mask_width = self.floor_mask.shape
+        if width > mask_width or height > mask_height:
+            return False
+        sat = self.floor_mask_sat
+        # Covered-cell counts of every width x height window at once
+        windows = sat[height:, width:] - sat[:-height, width:] - sat[height:, :-width] + sat[:-height, :-width]
+        return bool((windows == width * height).any())
+
+    def generate_layout(self, max_attempts=1000, enable_expansion=True, enable_space_optimization=True,
+                        n_workers=None, seed=None, time_budget=None, deadline=None, cancel_token=None,
+                        strategy='restarts', annealing_options=None, hierarchical_options=None):
         # """
         # Generate a floor plan layout by placing rooms within the boundary.
 
@@ -1142,23 +3087,166 @@ class FloorPlan:
         # - max_attempts (int): Maximum number of attempts to place rooms.
         # - enable_expansion (bool): Allow rooms to expand up to their max_expansion limit.
         # - enable_space_optimization (bool): Optimize space usage by minimizing unused areas.
+        # - n_workers (int): Number of worker processes for the restarts (None or 1 runs serially).
+        # - seed (int): Random seed for reproducible layouts.
+        # - time_budget / deadline / cancel_token: Stop early and keep the best layout so far
+        #   (see generate_layout_anytime). max_attempts still caps the number of restarts.
+        #   The limits bound the search only, not the post-processing after it.
+        #   The anytime search runs serially, so with the 'restarts' and 'annealing'
+        #   strategies these cannot be combined with n_workers > 1 (ValueError).
+        # - strategy (str): 'restarts' (random restarts only), 'annealing' (restarts, then
+        #   SimulatedAnnealingEngine from the best result, configured by annealing_options)
+        #   'components' (place_rooms_by_components), 'regions' (place_rooms_by_regions)
+        #   or 'hierarchical' (HierarchicalPlacementEngine, configured by
+        #   hierarchical_options, for plans with hundreds of rooms). The time limits
+        #   only apply to the first two.
 
         # Returns:
         # - bool: True if layout generation is successful, False otherwise.
+        #   Inputs rejected by check_feasibility() return False immediately; the report
+        #   is kept in self.feasibility_report.
         # """
+        if strategy not in ('restarts', 'annealing', 'components', 'regions', 'hierarchical'):
+            raise ValueError(f"Unknown layout strategy '{strategy}'")
+
+        self.feasibility_report = self.check_feasibility()
+        if not self.feasibility_report.feasible:
+            return False
+
+        if strategy in ('components', 'regions', 'hierarchical'):
+            if strategy == 'components':
+                success = self.place_rooms_by_components(max_attempts=max_attempts, enable_expansion=enable_expansion,
+                                                         n_workers=n_workers, seed=seed)
+            elif strategy == 'regions':
+                success = self.place_rooms_by_regions(max_attempts=max_attempts, enable_expansion=enable_expansion,
+                                                      n_workers=n_workers, seed=seed)
+            else:
+                options = dict(hierarchical_options or {})
+                options.setdefault('n_workers', n_workers)
+                options.setdefault('seed', seed)
+                success = HierarchicalPlacementEngine(self, **options).run(enable_expansion=enable_expansion)
+            if success:
+                self.enforce_minimum_adjacency()
+                self.compact_rooms()
+            return success
+
+        anytime = time_budget is not None or deadline is not None or cancel_token is not None
+        if anytime and n_workers is not None and n_workers > 1:
+            raise ValueError("time_budget, deadline and cancel_token cannot be combined with n_workers > 1")
+        if anytime:
+            success = self.generate_layout_anytime(time_budget=time_budget, deadline=deadline,
+                                                   cancel_token=cancel_token, enable_expansion=enable_expansion,
+                                                   max_attempts=max_attempts, seed=seed)
+            if success and strategy == 'annealing':
+                self._anneal(seed, annealing_options)
+                self.enforce_minimum_adjacency()
+                self.compact_rooms()
+            return success
+
         success = self.place_rooms_with_constraints_optimized(
             max_attempts=max_attempts,
             enable_expansion=enable_expansion,
-            use_compact_mode=enable_space_optimization
+            use_compact_mode=enable_space_optimization,
+            n_workers=n_workers,
+            seed=seed
         )
+        if success and strategy == 'annealing':
+            self._anneal(seed, annealing_options)
         if success:
             # Enforce minimum adjacency and compact rooms, as in the example usage
             self.enforce_minimum_adjacency()
             self.compact_rooms()
         return success
 
-    def generate_blocks(self, max_iterations=100):
-        """Generate blocks from placed rooms"""
+    def _anneal(self, seed=None, annealing_options=None):
+        """Refine the current placement with SimulatedAnnealingEngine"""
+        options = dict(annealing_options or {})
+        options.setdefault('seed', seed)
+        return SimulatedAnnealingEngine(self, **options).run()
+
+    def iter_placements(self, time_budget=None, deadline=None, cancel_token=None, enable_expansion=True,
+                        max_attempts=None, seed=None):
+        """
+        Anytime variant of the restart search. Yields (score, placement) every time a
+        strictly better placement is found, where placement is a _capture_placement()
+        snapshot, and stops once every adjacency is satisfied, the deadline (a
+        time.monotonic() timestamp) or time_budget (seconds) passes, cancel_token is
+        set, or max_attempts restarts have run. Stop conditions are also checked before
+        every room of an attempt, and an attempt cut short that way is dropped. The
+        rooms are left in the state of the last attempt.
+        """
+        if time_budget is not None:
+            budget_deadline = time.monotonic() + time_budget
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        if seed is not None:
+            random.seed(seed)
+
+        sorted_rooms = self._placement_order()
+        target_score = len(self.adjacency_graph.edges)
+        best_score = -math.inf
+        attempt = 0
+
+        def should_stop():
+            return ((cancel_token is not None and cancel_token.is_set()) or
+                    (deadline is not None and time.monotonic() >= deadline))
+
+        while max_attempts is None or attempt < max_attempts:
+            if should_stop():
+                return
+            attempt += 1
+
+            if self._attempt_placement(sorted_rooms, enable_expansion, should_stop):
+                score = self.running_adjacency_score()
+                if score > best_score:
+                    best_score = score
+                    yield score, self._capture_placement()
+                    if score == target_score:
+                        return
+
+    def generate_layout_anytime(self, time_budget=None, deadline=None, cancel_token=None, enable_expansion=True,
+                                max_attempts=None, seed=None, on_improvement=None):
+        """
+        Generate a layout under a wall-clock budget instead of an attempt count.
+
+        Runs iter_placements until it finishes, then restores the best layout found so
+        far and post-processes it like generate_layout. The post-processing
+        (enforce_minimum_adjacency and compact_rooms) runs after the search has stopped
+        and is not counted against time_budget or deadline; an attempt still running
+        when they expire is abandoned, so a budget shorter than one attempt yields no
+        layout. on_improvement, if given, is
+        called with (score, placement) for every improvement, so a caller can serve an
+        early layout while the search keeps refining it (e.g. in a background thread
+        that is stopped through cancel_token). At least one of time_budget, deadline,
+        cancel_token or max_attempts should be given, otherwise the search only ends
+        once every adjacency is satisfied.
+
+        Returns True if any complete placement was found.
+        """
+        best_placement = None
+        for score, placement in self.iter_placements(time_budget=time_budget, deadline=deadline,
+                                                     cancel_token=cancel_token, enable_expansion=enable_expansion,
+                                                     max_attempts=max_attempts, seed=seed):
+            best_placement = placement
+            if on_improvement is not None:
+                on_improvement(score, placement)
+
+        if best_placement is None:
+            self._clear_placements()
+            return False
+
+        self._restore_placement(best_placement)
+        self.enforce_minimum_adjacency()
+        self.compact_rooms()
+        return True
+
+    def generate_blocks(self, max_iterations=100, exact_limit=20, time_limit=1.0):
+        """
+        Generate blocks from placed rooms.
+
+        Of all candidate blocks, a set without shared rooms is chosen that covers
+        as many rooms as possible with as few blocks as possible (see
+        _select_blocks for exact_limit and time_limit).
+        """
         if not self.rooms or any(room.x is None for room in self.rooms):
             return [], self.rooms
 
@@ -1169,22 +3257,17 @@ class FloorPlan:
         # First pass - find all possible blocks
         all_blocks = self._find_all_possible_blocks()
 
-        # Sort blocks by size (largest first) then by room combination
-        all_blocks.sort(key=lambda b: (-b.width * b.height, b.block_id))
-
         # Mark rooms as unassigned
         for room in self.rooms:
             room.block_id = None
 
-        # Greedily assign rooms to blocks
-        assigned_rooms = set()
-        for block in all_blocks:
-            # Check if all rooms in this block are unassigned
-            if all(room.block_id is None for room in block.rooms):
-                self.blocks.append(block)
-                for room in block.rooms:
-                    room.block_id = block.block_id
-                    assigned_rooms.add(room)
+        # Pick the partition, largest blocks first
+        chosen = self._select_blocks(all_blocks, exact_limit, time_limit)
+        chosen.sort(key=lambda b: (-b.width * b.height, b.block_id))
+        for block in chosen:
+            self.blocks.append(block)
+            for room in block.rooms:
+                room.block_id = block.block_id
 
         # Handle residuals
         residuals = [room for room in self.rooms if room.block_id is None]
@@ -1197,119 +3280,203 @@ class FloorPlan:
 
         return self.blocks, residuals
 
-    def _find_all_possible_blocks(self):
-        """Find all possible rectangular blocks in the floor plan"""
-        # Create a grid representation of room types
-        grid, x_offset, y_offset = self._create_room_type_grid()
-        if not grid:
+    def _select_blocks(self, blocks, exact_limit=20, time_limit=1.0):
+        """
+        Choose blocks without shared rooms covering as many rooms as possible,
+        then using as few blocks as possible.
+
+        Rooms linked by candidate blocks form independent groups. A group of at
+        most exact_limit rooms is solved exactly; a larger one starts from a greedy
+        pick of the blocks with the most rooms and is improved by re-solving
+        windows of exact_limit neighbouring rooms exactly until nothing improves
+        or time_limit seconds have passed.
+        """
+        rooms = list(dict.fromkeys(room for block in blocks for room in block.rooms))
+        bit = {room: 1 << i for i, room in enumerate(rooms)}
+        masks = [sum(bit[room] for room in block.rooms) for block in blocks]
+
+        links = nx.Graph()
+        links.add_nodes_from(range(len(rooms)))
+        for block in blocks:
+            members = [bit[room].bit_length() - 1 for room in block.rooms]
+            links.add_edges_from(zip(members, members[1:]))
+
+        deadline = time.monotonic() + time_limit
+        chosen = []
+        for group in nx.connected_components(links):
+            group_mask = sum(1 << i for i in group)
+            candidates = [k for k, mask in enumerate(masks) if mask & group_mask]
+            if len(group) <= exact_limit:
+                chosen.extend(_best_block_packing(masks, candidates, group_mask))
+            else:
+                chosen.extend(self._improve_block_packing(rooms, masks, candidates, group, exact_limit, deadline))
+        return [blocks[k] for k in chosen]
+
+    def _improve_block_packing(self, rooms, masks, candidates, group, window, deadline):
+        """Greedy packing of a large group of rooms, refined by exact re-solves of room windows"""
+        picked = []
+        used = 0
+        for k in sorted(candidates, key=lambda k: (-bin(masks[k]).count('1'), k)):
+            if not masks[k] & used:
+                picked.append(k)
+                used |= masks[k]
+
+        # Windows of rooms that lie close together, half overlapping
+        group = sorted(group, key=lambda i: (rooms[i].y, rooms[i].x))
+        step = max(window // 2, 1)
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            for start in range(0, max(len(group) - step, 1), step):
+                if time.monotonic() >= deadline:
+                    break
+                window_mask = sum(1 << i for i in group[start:start + window])
+                inside = [k for k in picked if masks[k] & window_mask == masks[k]]
+                # Rooms of blocks reaching outside the window stay where they are
+                free = window_mask
+                for k in picked:
+                    if masks[k] & window_mask != masks[k]:
+                        free &= ~masks[k]
+                local = [k for k in candidates if masks[k] & free == masks[k]]
+                best = _best_block_packing(masks, local, free)
+                if _packing_key(masks, best) < _packing_key(masks, inside):
+                    picked = [k for k in picked if k not in inside] + best
+                    improved = True
+        return picked
+
+    def _find_all_possible_blocks(self, max_rooms=4):
+        """
+        Find every set of up to max_rooms placed rooms that is connected through
+        shared walls and exactly tiles its bounding box, as Block objects.
+
+        Sets are grown one neighbour at a time along the contact graph, so only
+        rooms that actually touch are ever combined. Each set carries its bounding
+        box and summed room area; a set is a block when the two areas are equal.
+        """
+        rooms = [room for room in self.rooms if room.x is not None and room.y is not None]
+        if not rooms:
             return []
 
-        width = len(grid[0])
-        height = len(grid)
+        contacts = WallContactIndex()
+        for room in rooms:
+            contacts.insert(room, (room.x, room.y, room.width, room.height))
+        graph = contacts.contact_graph()
+        index = {room.name: i for i, room in enumerate(rooms)}
+        neighbours = [frozenset(index[name] for name in graph[room.name]) for room in rooms]
 
-        # Find all maximal rectangles for each room combination
         blocks = []
-        room_positions = defaultdict(list)
-
-        # Record positions of each room type
-        for y in range(height):
-            for x in range(width):
-                if grid[y][x]:
-                    room_positions[grid[y][x]].append((x, y))
-
-        # Generate all possible room type combinations (up to 4 rooms per block)
-        all_combinations = []
-        for k in range(1, 5):
-            all_combinations.extend(combinations(room_positions.keys(), k))
-
-        # For each combination, find maximal rectangles
-        for combo in all_combinations:
-            combo_set = set(combo)
-            mask = [[1 if (cell in combo_set) else 0 for cell in row] for row in grid]
-
-            # Find all rectangles in this mask
-            rects = self._find_max_rectangles(mask)
-
-            # Convert to Block objects
-            for (x, y, w, h) in rects:
-                # Get actual rooms in this rectangle
-                rooms_in_block = []
-                for dy in range(h):
-                    for dx in range(w):
-                        room_x = x + dx + x_offset
-                        room_y = y + dy + y_offset
-                        for room in self.rooms:
-                            if (room.x <= room_x < room.x + room.width and
-                                    room.y <= room_y < room.y + room.height):
-                                rooms_in_block.append(room)
-                                break
-
-                if rooms_in_block:
-                    # Create unique block ID based on room types and dimensions
-                    room_types = sorted(set(r.name for r in rooms_in_block))
-                    block_id = "-".join(room_types) + f"_{w}x{h}"
-
+        seen = set()
+        frontier = [(frozenset([i]), (room.x, room.y, room.x + room.width, room.y + room.height),
+                     room.width * room.height) for i, room in enumerate(rooms)]
+        for size in range(1, max_rooms + 1):
+            grown_sets = []
+            for members, (x0, y0, x1, y1), area in frontier:
+                if (x1 - x0) * (y1 - y0) == area:
+                    members_rooms = sorted((rooms[i] for i in members), key=lambda room: room.name)
+                    room_types = [room.name for room in members_rooms]
                     blocks.append(Block(
-                        block_id=block_id,
-                        x=x + x_offset,
-                        y=y + y_offset,
-                        width=w,
-                        height=h,
-                        rooms=rooms_in_block,
+                        block_id="-".join(room_types) + f"_{x1 - x0}x{y1 - y0}",
+                        x=x0,
+                        y=y0,
+                        width=x1 - x0,
+                        height=y1 - y0,
+                        rooms=members_rooms,
                         room_types=set(room_types)
                     ))
+                if size == max_rooms:
+                    continue
+
+                # Grow by one room touching the set, each resulting set only once
+                for j in frozenset().union(*(neighbours[i] for i in members)) - members:
+                    grown = members | {j}
+                    if grown in seen:
+                        continue
+                    seen.add(grown)
+                    other = rooms[j]
+                    grown_sets.append((grown, (min(x0, other.x), min(y0, other.y),
+                                               max(x1, other.x + other.width), max(y1, other.y + other.height)),
+                                       area + other.width * other.height))
+            frontier = grown_sets
 
         return blocks
 
     def _create_room_type_grid(self):
-        """Create a grid where each cell contains the room type at that position"""
-        if not self.rooms:
-            return None, 0, 0
+        """
+        Create a raster of room indices over the bounding box of the placed rooms.
 
-        min_x = min(room.x for room in self.rooms)
-        max_x = max(room.x + room.width for room in self.rooms)
-        min_y = min(room.y for room in self.rooms)
-        max_y = max(room.y + room.height for room in self.rooms)
+        Cell [y, x] holds k where table[k] is the room covering that position and 0
+        where there is none (table[0] is None), so the rooms in any rectangle are
+        np.unique of a slice. Returns (grid, table, x_offset, y_offset), with grid
+        None if no room is placed.
+        """
+        rooms = [room for room in self.rooms if room.x is not None and room.y is not None]
+        if not rooms:
+            return None, [None], 0, 0
 
-        width = int(max_x - min_x)
-        height = int(max_y - min_y)
-        grid = [[None for _ in range(width)] for _ in range(height)]
+        min_x = int(min(room.x for room in rooms))
+        max_x = int(max(room.x + room.width for room in rooms))
+        min_y = int(min(room.y for room in rooms))
+        max_y = int(max(room.y + room.height for room in rooms))
 
-        for room in self.rooms:
-            for x in range(int(room.x), int(room.x + room.width)):
-                for y in range(int(room.y), int(room.y + room.height)):
-                    grid[y - int(min_y)][x - int(min_x)] = room.name
+        grid = np.zeros((max_y - min_y, max_x - min_x), dtype=np.int32)
+        for label, room in enumerate(rooms, 1):
+            x, y = int(room.x) - min_x, int(room.y) - min_y
+            grid[y:y + int(room.height), x:x + int(room.width)] = label
 
-        return grid, int(min_x), int(min_y)
+        return grid, [None] + rooms, min_x, min_y
 
-    def _find_max_rectangles(self, matrix):
-        """Find all maximal rectangles of 1's in a binary matrix"""
-        if not matrix:
+    def _find_max_rectangles(self, matrix, largest=None):
+        """
+        Find all maximal rectangles of 1's in a binary matrix, as (x, y, w, h) with
+        (x, y) the top-left cell (row y, column x). With largest=k only the k
+        largest are returned, largest first (ties by y, then x).
+
+        The column histograms of every row are computed at once. A rectangle with
+        bottom row i and height H[i, j] spans the columns between the nearest
+        shorter histogram bars on either side of j, found for the whole grid with
+        vectorized pointer jumping. It is kept if row i + 1 does not fill its
+        whole width, and reported once however many columns j produce it.
+        """
+        grid = np.asarray(matrix, dtype=bool)
+        if grid.ndim != 2 or not grid.any():
             return []
-
-        rows = len(matrix)
-        cols = len(matrix[0])
-        rects = []
-
-        # Create a histogram of consecutive 1's for each column
-        hist = [0] * cols
-
-        for i in range(rows):
-            for j in range(cols):
-                hist[j] = hist[j] + 1 if matrix[i][j] else 0
-
-            # Find all maximal rectangles in this histogram
-            stack = []
-            for j in range(cols + 1):
-                h = hist[j] if j < cols else 0
-                while stack and hist[stack[-1]] > h:
-                    height = hist[stack.pop()]
-                    width = j if not stack else j - stack[-1] - 1
-                    if width > 0 and height > 0:
-                        x = stack[-1] + 1 if stack else 0
-                        y = i - height + 1
-                        rects.append((x, y, width, height))
-
+        rows, cols = grid.shape
+        if grid.all():
+            return [(0, 0, cols, rows)]
+
+        # heights[i, j]: run of 1's in column j ending at row i
+        filled = np.cumsum(grid, axis=0)
+        heights = filled - np.maximum.accumulate(np.where(grid, 0, filled), axis=0)
+
+        def nearest_shorter(bars):
+            # Padded index of the nearest strictly shorter bar to the left (0: none)
+            padded = np.concatenate([np.full((rows, 1), -1), bars], axis=1)
+            pointer = np.broadcast_to(np.arange(cols + 1) - 1, padded.shape).copy()
+            pointer[:, 0] = 0
+            while True:
+                jump = np.take_along_axis(padded, pointer, axis=1) >= padded
+                jump[:, 0] = False
+                if not jump.any():
+                    return pointer[:, 1:]
+                pointer = np.where(jump, np.take_along_axis(pointer, pointer, axis=1), pointer)
+
+        left = nearest_shorter(heights)
+        right = cols - nearest_shorter(heights[:, ::-1])[:, ::-1]
+        width = right - left
+
+        # A rectangle extends downwards if the next row is all 1's under it
+        prefix = np.zeros((rows + 1, cols + 1), dtype=np.int64)
+        prefix[:-1, 1:] = np.cumsum(grid, axis=1)
+        row_index = np.arange(rows)[:, None]
+        below = prefix[row_index + 1, right] - prefix[row_index + 1, left]
+        keep = (heights > 0) & (below < width)
+
+        i, j = np.nonzero(keep)
+        found = np.column_stack([left[i, j], i - heights[i, j] + 1, width[i, j], heights[i, j]])
+        rects = list(dict.fromkeys(map(tuple, found.tolist())))
+        if largest is not None:
+            rects.sort(key=lambda rect: (-rect[2] * rect[3], rect[1], rect[0]))
+            rects = rects[:largest]
         return rects
 
     def _process_residuals(self, residuals):
@@ -1409,6 +3576,467 @@ class FloorPlan:
         plt.show()
 
 
+class SimulatedAnnealingEngine:
+    """
+    Local search over an already placed FloorPlan.
+
+    Applies move, swap, rotate and resize operators to single rooms, scores each
+    step from the floor plan's running adjacency score (only edges incident to the
+    touched rooms are re-evaluated) and accepts worse layouts with the usual
+    exp(delta / T) probability. The floor plan is left in the best layout seen.
+    """
+
+    MOVES = ('move', 'swap', 'rotate', 'resize')
+
+    def __init__(self, floor_plan, iterations=5000, initial_temperature=1.0, final_temperature=0.02,
+                 schedule='geometric', move_weights=None, move_tries=10, seed=None):
+        """
+        schedule: 'geometric', 'linear' or a callable (step, iterations) -> temperature
+        move_weights: optional {move name: weight} to bias operator selection
+        move_tries: candidate positions a single move proposal may test before giving up
+        """
+        self.floor_plan = floor_plan
+        self.iterations = iterations
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.schedule = schedule
+        weights = move_weights or {}
+        self.moves = [move for move in self.MOVES if weights.get(move, 1) > 0]
+        self.move_weights = [weights.get(move, 1) for move in self.moves]
+        self.move_tries = move_tries
+        self.edges = list(floor_plan.adjacency_graph.edges)
+        self.random = random.Random(seed)
+        self.accepted = 0
+        self.best_score = None
+
+    def temperature(self, step):
+        if callable(self.schedule):
+            return self.schedule(step, self.iterations)
+        fraction = step / max(self.iterations - 1, 1)
+        if self.schedule == 'linear':
+            return self.initial_temperature + (self.final_temperature - self.initial_temperature) * fraction
+        if self.schedule == 'geometric':
+            return self.initial_temperature * (self.final_temperature / self.initial_temperature) ** fraction
+        raise ValueError(f"Unknown cooling schedule '{self.schedule}'")
+
+    def _state(self, room):
+        return room.x, room.y, room.width, room.height, room.rotated
+
+    def _restore(self, room, state):
+        x, y, width, height, rotated = state
+        room.rotated = rotated
+        self.floor_plan.move_room(room, x, y, width, height)
+
+    def _fits(self, room, x, y, width, height):
+        plan = self.floor_plan
+        return (plan.is_within_floor(x, y, width, height) and
+                not plan.check_overlap_optimized(room, x, y, width, height))
+
+    def _unsatisfied_pair(self):
+        """Sample a few adjacency edges and return an unsatisfied one as (room, partner)"""
+        plan = self.floor_plan
+        for _ in range(5):
+            name1, name2 = self.random.choice(self.edges)
+            if frozenset((name1, name2)) not in plan._satisfied_adjacencies:
+                if self.random.random() < 0.5:
+                    name1, name2 = name2, name1
+                room, partner = plan.get_room(name1), plan.get_room(name2)
+                # Fixed rooms never move, so slide their partner instead
+                return (partner, room) if room.fixed else (room, partner)
+        return None, None
+
+    def _propose_move(self, rooms):
+        """Translate one room, preferably flush against an adjacency partner it does not touch yet"""
+        plan = self.floor_plan
+        room = other = None
+        if self.edges and self.random.random() < 0.7:
+            room, other = self._unsatisfied_pair()
+        if room is None or room.fixed or room.x is None or other is None or other.x is None:
+            room = self.random.choice(rooms)
+            other = None
+
+        for _ in range(self.move_tries):
+            if other is not None:
+                # Pick a side of the partner and slide along it anywhere the walls still overlap
+                side = self.random.randrange(4)
+                if side < 2:
+                    x = other.x + other.width if side == 0 else other.x - room.width
+                    y = self.random.randint(other.y - room.height + 1, other.y + other.height - 1)
+                else:
+                    x = self.random.randint(other.x - room.width + 1, other.x + other.width - 1)
+                    y = other.y + other.height if side == 2 else other.y - room.height
+            else:
+                region = self.random.choice(plan.floor_regions)
+                if region['width'] < room.width or region['height'] < room.height:
+                    continue
+                x = self.random.randint(region['x'], region['x'] + region['width'] - room.width)
+                y = self.random.randint(region['y'], region['y'] + region['height'] - room.height)
+
+            if self._fits(room, x, y, room.width, room.height):
+                undo = [(room, self._state(room))]
+                plan.move_room(room, x, y)
+                return undo
+        return None
+
+    def _propose_swap(self, rooms):
+        """Exchange the anchor positions of two rooms"""
+        if len(rooms) < 2:
+            return None
+        plan = self.floor_plan
+        room1, room2 = self.random.sample(rooms, 2)
+        state1, state2 = self._state(room1), self._state(room2)
+
+        # Take both out of the index so each can be tested against everything else
+        plan.move_room(room1, None, None)
+        plan.move_room(room2, None, None)
+        new1 = (state2[0], state2[1], room1.width, room1.height)
+        new2 = (state1[0], state1[1], room2.width, room2.height)
+        if (self._fits(room1, *new1) and self._fits(room2, *new2) and
+                intersection_area(new1, new2) == 0):
+            plan.move_room(room1, new1[0], new1[1])
+            plan.move_room(room2, new2[0], new2[1])
+            return [(room1, state1), (room2, state2)]
+
+        self._restore(room1, state1)
+        self._restore(room2, state2)
+        return None
+
+    def _propose_rotate(self, rooms):
+        """Rotate a room about its anchor corner"""
+        room = self.random.choice(rooms)
+        if room.width == room.height or not self._fits(room, room.x, room.y, room.height, room.width):
+            return None
+        undo = [(room, self._state(room))]
+        room.rotated = not room.rotated
+        self.floor_plan.move_room(room, room.x, room.y, room.height, room.width)
+        return undo
+
+    def _propose_resize(self, rooms):
+        """Grow or shrink one wall of a room by a unit, within its expansion budget"""
+        plan = self.floor_plan
+        room = self.random.choice(rooms)
+        direction = self.random.choice(['right', 'left', 'up', 'down'])
+        base_width, base_height = ((room.original_height, room.original_width) if room.rotated
+                                   else (room.original_width, room.original_height))
+        x, y, width, height = room.x, room.y, room.width, room.height
+
+        if self.random.random() < 0.5:
+            if not plan.can_expand_room_optimized(room, direction, 1):
+                return None
+            delta = 1
+        else:
+            # Shrinking never creates overlaps but may not go below the original size
+            if direction in ('right', 'left') and width <= base_width:
+                return None
+            if direction in ('up', 'down') and height <= base_height:
+                return None
+            delta = -1
+
+        if direction == 'right':
+            width += delta
+        elif direction == 'left':
+            x -= delta
+            width += delta
+        elif direction == 'up':
+            height += delta
+        else:
+            y -= delta
+            height += delta
+
+        undo = [(room, self._state(room))]
+        plan.move_room(room, x, y, width, height)
+        return undo
+
+    def run(self):
+        """Anneal the current placement. Returns the best score found."""
+        plan = self.floor_plan
+        rooms = [room for room in plan.rooms if room.x is not None and room.y is not None and not room.fixed]
+        if not rooms:
+            return None
+        if not plan._index_is_current():
+            plan.rebuild_spatial_index()
+
+        proposals = {
+            'move': self._propose_move,
+            'swap': self._propose_swap,
+            'rotate': self._propose_rotate,
+            'resize': self._propose_resize,
+        }
+        target_score = len(plan.adjacency_graph.edges)
+        current_score = plan.running_adjacency_score()
+        best_score = current_score
+        best_placement = plan._capture_placement()
+
+        for step in range(self.iterations):
+            temperature = self.temperature(step)
+            move = self.random.choices(self.moves, weights=self.move_weights)[0]
+            undo = proposals[move](rooms)
+            if undo is None:
+                continue
+
+            new_score = plan.running_adjacency_score()
+            delta = new_score - current_score
+            if delta >= 0 or (temperature > 0 and self.random.random() < math.exp(delta / temperature)):
+                current_score = new_score
+                self.accepted += 1
+                if current_score > best_score:
+                    best_score = current_score
+                    best_placement = plan._capture_placement()
+                    if best_score == target_score:
+                        break
+            else:
+                for room, state in reversed(undo):
+                    self._restore(room, state)
+
+        plan._restore_placement(best_placement)
+        self.best_score = best_score
+        return best_score
+
+
+class HierarchicalPlacementEngine:
+    """
+    Two-level placement for plans with hundreds of rooms.
+
+    The adjacency graph is cut into clusters of at most max_cluster_size tightly
+    connected rooms (modularity communities, bisected further when too large).
+    Each cluster is laid out on its own as a compact super-rectangle, the
+    super-rectangles are placed on the floor by a FloorPlan of their own whose
+    adjacencies are the edges cut between clusters, and a refinement pass then
+    slides rooms along their partners across cluster borders. Rooms are placed
+    in the original FloorPlan, so everything downstream works unchanged.
+    """
+
+    def __init__(self, floor_plan, max_cluster_size=12, cluster_attempts=20, super_attempts=10,
+                 refine_passes=2, n_workers=None, seed=None):
+        """
+        cluster_attempts: restarts per cluster layout (see FloorPlan._layout_component)
+        super_attempts: restarts when placing the cluster super-rectangles
+        refine_passes: sweeps over the unsatisfied adjacencies after assembly
+        n_workers: lay the clusters out in a process pool when > 1
+        """
+        self.floor_plan = floor_plan
+        self.max_cluster_size = max_cluster_size
+        self.cluster_attempts = cluster_attempts
+        self.super_attempts = super_attempts
+        self.refine_passes = refine_passes
+        self.n_workers = n_workers
+        self.seed = seed
+
+    def clusters(self):
+        """
+        Partition the constrained rooms into clusters of room names. Rooms without
+        any constraint are left out (see FloorPlan.constraint_components).
+        """
+        clusters = []
+        for names in self.floor_plan.constraint_components():
+            if len(names) == 1:
+                continue
+            if len(names) <= self.max_cluster_size:
+                clusters.append(names)
+                continue
+            subgraph = self.floor_plan.adjacency_graph.subgraph(names).copy()
+            subgraph.add_nodes_from(names)
+            for community in nx.community.greedy_modularity_communities(subgraph):
+                clusters.extend(self._split(subgraph.subgraph(community)))
+        return clusters
+
+    def _split(self, graph):
+        """Bisect graph until every part has at most max_cluster_size nodes"""
+        if graph.number_of_nodes() <= self.max_cluster_size:
+            return [sorted(graph.nodes)]
+        first, second = nx.community.kernighan_lin_bisection(graph, seed=self.seed)
+        return self._split(graph.subgraph(first)) + self._split(graph.subgraph(second))
+
+    def run(self, enable_expansion=True):
+        """Place every room of the floor plan. Returns True if all rooms were placed."""
+        floor_plan = self.floor_plan
+        floor_plan._clear_placements()
+        if self.seed is not None:
+            random.seed(self.seed)
+
+        clusters = self.clusters()
+        layouts = self._layout_clusters(clusters)
+        self._place_super_rectangles([(names, layout) for names, layout in zip(clusters, layouts)
+                                      if layout is not None])
+
+        # Rooms of clusters without a layout or a place, and the unconstrained ones, around the placed clusters
+        if not floor_plan._place_unplaced(self.cluster_attempts):
+            return False
+
+        floor_plan.refine_adjacencies(self.refine_passes)
+
+        if enable_expansion:
+            floor_plan.expand_rooms_optimized()
+        return True
+
+    def _layout_clusters(self, clusters):
+        """Lay out every cluster on its own, in a process pool when n_workers > 1"""
+        if self.n_workers is not None and self.n_workers > 1 and len(clusters) > 1:
+            base_seed = self.seed if self.seed is not None else random.randrange(2 ** 32)
+            with ProcessPoolExecutor(max_workers=min(self.n_workers, len(clusters))) as executor:
+                futures = [executor.submit(_component_worker, self.floor_plan, names, self.cluster_attempts,
+                                           base_seed + i)
+                           for i, names in enumerate(clusters)]
+                return [future.result() for future in futures]
+        return [self.floor_plan._layout_component(names, self.cluster_attempts) for names in clusters]
+
+    def _place_super_rectangles(self, placed):
+        """
+        Place the cluster layouts on the floor as single rooms of a super FloorPlan,
+        adjacent wherever an adjacency edge runs between two clusters and kept apart
+        where only non-adjacency edges do. Falls back to packing the boxes
+        lowest-left first. Returns the rooms of clusters that did not fit, plus one
+        room of every non-adjacent pair that still ended up sharing a wall.
+        """
+        floor_plan = self.floor_plan
+        if not placed:
+            return []
+        cluster_of = {name: index for index, (names, _) in enumerate(placed) for name in names}
+
+        super_plan = FloorPlan(floor_plan.floor_regions, candidate_strategy=floor_plan.candidate_strategy,
+                               candidate_ranking=floor_plan.candidate_ranking)
+        for index, (_, layout) in enumerate(placed):
+            super_plan.add_room(f"cluster_{index}", layout['width'], layout['height'], max_expansion=0)
+        floor_plan._copy_fixed_rooms(super_plan)
+        for room1_name, room2_name in floor_plan.adjacency_graph.edges:
+            first, second = cluster_of.get(room1_name), cluster_of.get(room2_name)
+            if first is not None and second is not None and first != second:
+                super_plan.add_adjacency(f"cluster_{first}", f"cluster_{second}")
+        # Clusters that must touch somewhere cannot be kept apart; those are checked below
+        for room1_name, room2_name in floor_plan.non_adjacency_graph.edges:
+            first, second = cluster_of.get(room1_name), cluster_of.get(room2_name)
+            if first is not None and second is not None and first != second and \
+                    not super_plan.adjacency_graph.has_edge(f"cluster_{first}", f"cluster_{second}"):
+                super_plan.add_non_adjacency(f"cluster_{first}", f"cluster_{second}")
+
+        _, super_placement = super_plan._search_placements(self.super_attempts, enable_expansion=False)
+        if super_placement is not None:
+            for index, (_, layout) in enumerate(placed):
+                _, x, y, _, _, rotated, _ = super_placement[index]
+                layout = _rotate_layout(layout) if rotated else layout
+                floor_plan._place_layout(layout, x, y)
+            return self._evict_non_adjacent()
+
+        pending = []
+        for names, layout in sorted(placed, key=lambda item: -item[1]['width'] * item[1]['height']):
+            if 'origin' in layout and floor_plan._layout_fits(layout, *layout['origin']):
+                floor_plan._place_layout(layout, *layout['origin'])
+            elif not floor_plan._pack_layout(layout):
+                pending.extend(floor_plan.get_room(name) for name in names)
+        return pending + self._evict_non_adjacent()
+
+    def _evict_non_adjacent(self):
+        """Unplace one room of every non-adjacent pair sharing a wall and return those rooms"""
+        floor_plan = self.floor_plan
+        evicted = []
+        for room1_name, room2_name in floor_plan.non_adjacency_graph.edges:
+            if frozenset((room1_name, room2_name)) not in floor_plan._violated_non_adjacencies:
+                continue
+            room = floor_plan.get_room(room2_name)
+            if room.fixed:
+                room = floor_plan.get_room(room1_name)
+            floor_plan._remove_from_spatial_index(room)
+            room.x = None
+            room.y = None
+            evicted.append(room)
+        return evicted
+
+
+def _placement_worker(floor_plan, max_attempts, seed, enable_expansion, target_score, stop_event):
+    """Process-pool entry point for FloorPlan._place_rooms_parallel"""
+    random.seed(seed)
+    score, placement = floor_plan._search_placements(max_attempts, enable_expansion, stop_event=stop_event)
+    if score == target_score:
+        stop_event.set()
+    return score, placement
+
+
+def _packing_key(masks, picked):
+    """Sort key of a block packing: more rooms covered first, then fewer blocks"""
+    return -sum(bin(masks[k]).count('1') for k in picked), len(picked)
+
+
+def _best_block_packing(masks, candidates, universe):
+    """
+    Exact packing of the rooms in the bitmask universe with the room-bitmask
+    blocks masks[k], k in candidates: no room in two blocks, as many rooms
+    covered as possible, then as few blocks as possible. The lowest undecided
+    room is either covered by a block containing it or left out; results are
+    memoized on the set of decided rooms. Returns the chosen block indices.
+    """
+    containing = defaultdict(list)
+    for k in candidates:
+        mask = masks[k]
+        if mask & universe == mask:
+            while mask:
+                containing[(mask & -mask).bit_length() - 1].append(k)
+                mask &= mask - 1
+
+    memo = {}
+
+    def solve(decided):
+        # (uncovered rooms, blocks used, chosen block or None) for the undecided rest
+        if decided == universe:
+            return 0, 0, None
+        if decided in memo:
+            return memo[decided]
+        room = (universe & ~decided & -(universe & ~decided)).bit_length() - 1
+        uncovered, count, _ = solve(decided | 1 << room)
+        best = (uncovered + 1, count, None)
+        for k in containing[room]:
+            if not masks[k] & decided:
+                uncovered, count, _ = solve(decided | masks[k])
+                if (uncovered, count + 1) < best[:2]:
+                    best = (uncovered, count + 1, k)
+        memo[decided] = best
+        return best
+
+    picked = []
+    decided = 0
+    while decided != universe:
+        _, _, k = solve(decided)
+        if k is None:
+            decided |= universe & ~decided & -(universe & ~decided)
+        else:
+            picked.append(k)
+            decided |= masks[k]
+    return picked
+
+
+def _component_worker(floor_plan, room_names, max_attempts, seed):
+    """Process-pool entry point for FloorPlan.place_rooms_by_components"""
+    random.seed(seed)
+    return floor_plan._layout_component(room_names, max_attempts)
+
+
+def _region_worker(floor_plan, room_names, region, max_attempts, seed):
+    """Process-pool entry point for FloorPlan.place_rooms_by_regions"""
+    random.seed(seed)
+    sub_plan = floor_plan._subproblem(room_names, [region], with_fixed=True)
+    return sub_plan._search_placements(max_attempts, enable_expansion=False)[1]
+
+
+def _placement_layout(placement, score=None):
+    """Turn a _capture_placement snapshot into a layout relative to its bounding box"""
+    min_x = min(x for _, x, _, _, _, _, _ in placement)
+    min_y = min(y for _, _, y, _, _, _, _ in placement)
+    rooms = [(name, x - min_x, y - min_y, width, height, rotated, max_expansion)
+             for name, x, y, width, height, rotated, max_expansion in placement]
+    return {
+        'width': max(dx + width for _, dx, _, width, _, _, _ in rooms),
+        'height': max(dy + height for _, _, dy, _, height, _, _ in rooms),
+        'score': score,
+        'rooms': rooms,
+    }
+
+
+def _rotate_layout(layout):
+    """The same layout turned by 90 degrees (x, y) -> (y, width - x)"""
+    rooms = [(name, dy, layout['width'] - dx - width, height, width, not rotated, max_expansion)
+             for name, dx, dy, width, height, rotated, max_expansion in layout['rooms']]
+    return {'width': layout['height'], 'height': layout['width'], 'score': layout['score'], 'rooms': rooms}
+
+
 # Example usage
 if __name__ == "__main__":
     # Define floor shape with explicit x and y coordinates for each region
@@ -505,6 +505,11 @@ class FloorPlanGUI:
         ttk.Checkbutton(gen_controls_row, text="Enable Space Optimization",
                         variable=self.enable_space_optimization_var).grid(row=0, column=3, padx=20)
 
+        # Re-solve only around edited rooms when a previous layout exists
+        self.keep_layout_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(gen_controls_row, text="Keep Previous Layout",
+                        variable=self.keep_layout_var).grid(row=0, column=6, padx=20)
+
         # Second row - save controls
         save_controls_row = ttk.Frame(controls_frame)
         save_controls_row.pack(fill=tk.X)
@@ -705,12 +710,16 @@ class FloorPlanGUI:
                         room.width = placement["width"]
                         room.height = placement["height"]
                         room.rotated = placement.get("rotated", False)
+                        room.fixed = placement.get("fixed", False)
 
                         # Ensure original dimensions are preserved
                         if not hasattr(room, 'original_width'):
                             room.original_width = placement.get("original_width", placement["width"])
                             room.original_height = placement.get("original_height", placement["height"])
 
+                # Index the restored rooms so overlap queries see them
+                self.floor_plan.rebuild_spatial_index()
+
             # Update the display
             self.update_output_display()
 
@@ -779,7 +788,8 @@ class FloorPlanGUI:
                     "original_width": room.original_width,
                     "original_height": room.original_height,
                     "rotated": room.rotated,
-                    "max_expansion": room.max_expansion
+                    "max_expansion": room.max_expansion,
+                    "fixed": room.fixed
                 }
                 room_placements.append(placement)
 
@@ -1350,6 +1360,12 @@ class FloorPlanGUI:
                 messagebox.showerror("Error", "Please define at least one region")
                 return
 
+            # Remember the current layout so small edits can be re-solved locally
+            previous_plan = None
+            if self.floor_plan and self.keep_layout_var.get() and self.floor_plan.floor_regions == regions and \
+                    any(room.x is not None for room in self.floor_plan.rooms):
+                previous_plan = self.floor_plan
+
             # Create floor plan
             self.floor_plan = FloorPlan(regions)
 
@@ -1383,10 +1399,26 @@ class FloorPlanGUI:
 
             print(f"Total non-adjacencies added: {self.non_adjacencies_listbox.size()}")
 
+            # Reject impossible inputs before spending any attempts on them
+            report = self.floor_plan.check_feasibility()
+            if not report.feasible:
+                messagebox.showerror("Infeasible Floor Plan",
+                                     "These rooms cannot be placed on this floor:\n\n" + str(report))
+                return
+
             # Generate floor plan
             max_attempts = int(self.max_attempts_var.get())
             enable_expansion = self.enable_expansion_var.get()
 
+            if previous_plan is not None and self.floor_plan.relayout(previous_plan, max_attempts=max_attempts,
+                                                                      enable_expansion=enable_expansion):
+                self.floor_plan.compact_rooms()
+                self.floor_plan.enforce_minimum_adjacency()
+                self.floor_plan.compact_rooms()
+                messagebox.showinfo("Success", "Floor plan updated; unchanged rooms kept their positions!")
+                self.update_output_display()
+                return
+
             success = self.floor_plan.place_rooms_with_constraints_optimized(
                 use_compact_mode=self.enable_space_optimization_var.get(),
                 max_attempts=max_attempts,
@@ -1678,9 +1710,10 @@ class FloorPlanGUI:
         for room in self.floor_plan.rooms:
             violations = 0
             if room.name in self.floor_plan.non_adjacency_graph:
-                for non_adj_room_name in self.floor_plan.non_adjacency_graph[room.name]:
-                    non_adj_room = next((r for r in self.floor_plan.rooms if r.name == non_adj_room_name), None)
-                    if non_adj_room and room.has_shared_wall_with(non_adj_room):
+                # Only the rooms actually sharing a wall can be violations
+                forbidden = self.floor_plan.non_adjacency_graph[room.name]
+                for neighbor in self.floor_plan.shared_wall_neighbors(room):
+                    if neighbor.name in forbidden:
                         violations += 1
             room_violations[room.name] = violations
 
@@ -1787,12 +1820,8 @@ class FloorPlanGUI:
         if num_rooms > 200:
             return self._calculate_constraint_stats_only()
 
-        constraint_stats = {
-            'adjacent_pairs': [],
-            'unsatisfied_adjacencies': [],
-            'non_adjacency_satisfied': [],
-            'non_adjacency_violated': []
-        }
+        # Classify every constraint from the floor plan's shared-wall matrix in one pass
+        constraint_stats = self._calculate_constraint_stats_only()
 
         # Adaptive line styling
         line_alpha = max(0.3, min(0.8, 1.0 / np.sqrt(num_rooms / 20 + 1)))
@@ -1802,88 +1831,52 @@ class FloorPlanGUI:
         show_all_constraints = num_rooms <= 100
         show_violations_only = num_rooms > 100
 
+        def centers(room1_name, room2_name):
+            room1 = self.floor_plan.get_room(room1_name)
+            room2 = self.floor_plan.get_room(room2_name)
+            return ((room1.x + room1.width / 2, room1.y + room1.height / 2),
+                    (room2.x + room2.width / 2, room2.y + room2.height / 2))
+
         # Process adjacency relationships
-        for room1_name, room2_name in self.floor_plan.adjacency_graph.edges:
-            room1 = next((r for r in self.floor_plan.rooms if r.name == room1_name), None)
-            room2 = next((r for r in self.floor_plan.rooms if r.name == room2_name), None)
-
-            if room1 and room2 and room1.x is not None and room2.x is not None:
-                center1 = (room1.x + room1.width / 2, room1.y + room1.height / 2)
-                center2 = (room2.x + room2.width / 2, room2.y + room2.height / 2)
-
-                if room1.has_shared_wall_with(room2):
-                    constraint_stats['adjacent_pairs'].append((room1_name, room2_name))
-                    if show_all_constraints:
-                        self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'g-',
-                                     linewidth=line_width, alpha=line_alpha)
-                else:
-                    constraint_stats['unsatisfied_adjacencies'].append((room1_name, room2_name))
-                    if show_all_constraints or show_violations_only:
-                        self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'r--',
-                                     linewidth=line_width * 1.2, alpha=min(0.9, line_alpha * 1.5))
+        if show_all_constraints:
+            for room1_name, room2_name in constraint_stats['adjacent_pairs']:
+                center1, center2 = centers(room1_name, room2_name)
+                self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'g-',
+                             linewidth=line_width, alpha=line_alpha)
+
+        if show_all_constraints or show_violations_only:
+            for room1_name, room2_name in constraint_stats['unsatisfied_adjacencies']:
+                center1, center2 = centers(room1_name, room2_name)
+                self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'r--',
+                             linewidth=line_width * 1.2, alpha=min(0.9, line_alpha * 1.5))
 
         # Process non-adjacency relationships
-        for room1_name, room2_name in self.floor_plan.non_adjacency_graph.edges:
-            room1 = next((r for r in self.floor_plan.rooms if r.name == room1_name), None)
-            room2 = next((r for r in self.floor_plan.rooms if r.name == room2_name), None)
-
-            if room1 and room2 and room1.x is not None and room2.x is not None:
-                center1 = (room1.x + room1.width / 2, room1.y + room1.height / 2)
-                center2 = (room2.x + room2.width / 2, room2.y + room2.height / 2)
-
-                if room1.has_shared_wall_with(room2):
-                    # Violation - always show these
-                    constraint_stats['non_adjacency_violated'].append((room1_name, room2_name))
-
-                    # Violation lines and markers
-                    self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'red',
-                                 linewidth=line_width * 1.5, linestyle=':', alpha=min(0.9, line_alpha * 1.5))
-
-                    # Show warning markers only for manageable numbers
-                    if num_rooms <= 150:
-                        marker_size = max(4, min(12, 60 / np.sqrt(num_rooms)))
-                        self.ax.plot(center1[0], center1[1], 'rX', markersize=marker_size, alpha=0.9)
-                        self.ax.plot(center2[0], center2[1], 'rX', markersize=marker_size, alpha=0.9)
-                else:
-                    constraint_stats['non_adjacency_satisfied'].append((room1_name, room2_name))
-                    if show_all_constraints:
-                        self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]],
-                                     color='blue', linewidth=line_width, linestyle=':', alpha=line_alpha * 0.7)
+        for room1_name, room2_name in constraint_stats['non_adjacency_violated']:
+            center1, center2 = centers(room1_name, room2_name)
 
-        return constraint_stats
+            # Violation lines and markers - always show these
+            self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]], 'red',
+                         linewidth=line_width * 1.5, linestyle=':', alpha=min(0.9, line_alpha * 1.5))
 
-    def _calculate_constraint_stats_only(self):
-        """Calculate constraint statistics without drawing (for very large plans)"""
-        constraint_stats = {
-            'adjacent_pairs': [],
-            'unsatisfied_adjacencies': [],
-            'non_adjacency_satisfied': [],
-            'non_adjacency_violated': []
-        }
-
-        # Just calculate stats without drawing
-        for room1_name, room2_name in self.floor_plan.adjacency_graph.edges:
-            room1 = next((r for r in self.floor_plan.rooms if r.name == room1_name), None)
-            room2 = next((r for r in self.floor_plan.rooms if r.name == room2_name), None)
+            # Show warning markers only for manageable numbers
+            if num_rooms <= 150:
+                marker_size = max(4, min(12, 60 / np.sqrt(num_rooms)))
+                self.ax.plot(center1[0], center1[1], 'rX', markersize=marker_size, alpha=0.9)
+                self.ax.plot(center2[0], center2[1], 'rX', markersize=marker_size, alpha=0.9)
 
-            if room1 and room2 and room1.x is not None and room2.x is not None:
-                if room1.has_shared_wall_with(room2):
-                    constraint_stats['adjacent_pairs'].append((room1_name, room2_name))
-                else:
-                    constraint_stats['unsatisfied_adjacencies'].append((room1_name, room2_name))
-
-        for room1_name, room2_name in self.floor_plan.non_adjacency_graph.edges:
-            room1 = next((r for r in self.floor_plan.rooms if r.name == room1_name), None)
-            room2 = next((r for r in self.floor_plan.rooms if r.name == room2_name), None)
-
-            if room1 and room2 and room1.x is not None and room2.x is not None:
-                if room1.has_shared_wall_with(room2):
-                    constraint_stats['non_adjacency_violated'].append((room1_name, room2_name))
-                else:
-                    constraint_stats['non_adjacency_satisfied'].append((room1_name, room2_name))
+        if show_all_constraints:
+            for room1_name, room2_name in constraint_stats['non_adjacency_satisfied']:
+                center1, center2 = centers(room1_name, room2_name)
+                self.ax.plot([center1[0], center2[0]], [center1[1], center2[1]],
+                             color='blue', linewidth=line_width, linestyle=':', alpha=line_alpha * 0.7)
 
         return constraint_stats
 
+    def _calculate_constraint_stats_only(self):
+        """Calculate constraint statistics without drawing (for very large plans)"""
+        # Reads the vectorized shared-wall matrix instead of testing each pair in Python
+        return self.floor_plan.constraint_status()
+
     def _set_plot_limits(self):
         """Set plot limits with padding"""
         max_width = self.floor_plan.floor_width